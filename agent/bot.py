@@ -1,6 +1,7 @@
 import json
-import wave
+import time
 import uuid
+import asyncio
 from PIL import Image
 from google.genai import Client, types
 from deepgram import (
@@ -9,21 +10,63 @@ from deepgram import (
     FileSource,
 )
 from config.settings import settings
-from lib.redis import Redis
+from lib.redis import AsyncRedis
+from lib.cache import ResponseCache, RedisResponseCache, AudioCache, audio_digest
+from lib.db import save_to_supabase, create_presigned_url
+from lib.metrics import record_latency, incr, timed
+from lib.audio import EncodedAudio, encode_pcm
+from agent.context import ContextBuilder, ConversationContext
+from agent.speech import GeminiTextToSpeech, stream_speech
+from lib.localization import weather_texts, static_translations, normalize_language, localize_weather, language_name
 
 client = Client(api_key=settings.gemini_api_key)
 deepgram_client = DeepgramClient(api_key=settings.deepgram_api_key)
-redis_client = Redis()
+redis_client = AsyncRedis()
+response_cache = RedisResponseCache()
+audio_cache = AudioCache()
+
+def parse_json_response(response_text: str):
+    """Parse a JSON reply from the model, stripping markdown code fences if present"""
+    response_text = response_text.strip()
+    if response_text.startswith("```"):
+        response_text = response_text.split("```")[1]
+        if response_text.startswith("json"):
+            response_text = response_text[4:]
+        response_text = response_text.strip()
+    return json.loads(response_text)
 
 class Bot:
-    def __init__(self):
+    def __init__(self, cache: ResponseCache = None):
         self.client = client
         self.deepgram_client = deepgram_client
         self.redis_client = redis_client
+        self.context_builder = ContextBuilder()
+        self.cache = cache or response_cache
+        self.audio_cache = audio_cache
+
+    async def _generate(self, namespace: str, model: str, prompt: str, language: str = "", use_cache: bool = True, parse=None):
+        """
+        Run a text-only prompt through the response cache. `parse` is applied to the reply before
+        it is cached, so replies that fail to parse raise and are never stored.
+        """
+        if use_cache:
+            cached = await self.cache.get(namespace, model, prompt, language)
+            if cached is not None:
+                return parse(cached) if parse else cached
+
+        response = await self.client.aio.models.generate_content(
+            model=model,
+            contents=[prompt]
+        )
+        result = parse(response.text) if parse else response.text
+        if use_cache:
+            await self.cache.set(namespace, model, prompt, response.text, language)
+        return result
 
-    async def analyse_output(self, diagnosis_result, image: str, language: str = "en"):
+    async def analyse_output(self, diagnosis_result, image: str | bytes, language: str = "en", mime_type: str = "image/jpeg"):
         """
         Analyse the output from a plant disease and pest detection model and provide a detailed analysis of the plant disease and/or pest and ways to cure the disease and pest to a farmer in a friendly and easy to understand manner.
+        `image` is a file path or the already-encoded image bytes (of `mime_type`).
         """
         disease_predictions = diagnosis_result[0]['model_2_predictions']['predictions']
         pest_predictions = diagnosis_result[0]['predictions']['predictions']
@@ -59,23 +102,20 @@ class Bot:
             - Pest Model Predictions: {[f"{pest_prediction.get('class')} with confidence {pest_prediction.get('confidence')}" for pest_prediction in pest_predictions]}
             """
 
-        image = Image.open(image)
+        if isinstance(image, bytes):
+            image = types.Part.from_bytes(data=image, mime_type=mime_type)
+        else:
+            image = Image.open(image)
         response = await self.client.aio.models.generate_content(
             model="gemini-2.0-flash",
             contents=[prompt, image]
         )
         return response.text
 
-    async def chat(self, history: list, language: str = "en"):
-        """
-        Chat with a bot and provide a response to the farmer in a friendly and easy to understand manner.
-        """
-        conversation_context = ""
-        if history:
-            for msg in history:
-                role = msg.get('role', 'user')
-                content = msg.get('content', '')
-                conversation_context += f"{role.capitalize()}: {content}\n\n"
+    def _chat_prompt(self, history: list, language: str = "en", summary: str = None) -> tuple[str, ConversationContext]:
+        """Build the chat prompt from the recent history and the rolling summary, within the context token budget."""
+        context = self.context_builder.build(history, summary)
+        conversation_context = context.text
         
         prompt = f"""
             You are a farming expert that has knowledge about crop planting and agricultural practices. You understand every language.
@@ -88,15 +128,87 @@ class Bot:
             
             Please provide a helpful response to the farmer's latest message, taking into account the conversation context.
             """
-        
-        response = await self.client.aio.models.generate_content(
+        return prompt, context
+
+    async def _record_context(self, context: ConversationContext) -> None:
+        """Count what the packed context cost, averages come from dividing by chat_context:requests"""
+        await asyncio.gather(
+            incr("chat_context:requests"),
+            incr("chat_context:tokens_used", context.tokens_used),
+            incr("chat_context:messages_used", context.messages_used),
+            incr("chat_context:messages_truncated", context.messages_truncated),
+            incr("chat_context:messages_dropped", context.messages_dropped),
+        )
+
+    async def chat(self, history: list, language: str = "en", summary: str = None, use_cache: bool = None):
+        """
+        Chat with a bot and provide a response to the farmer in a friendly and easy to understand manner.
+        `summary` is the rolling summary of older turns that have been compacted out of the history.
+        Only opening messages are cached by default: the key covers the whole history, so a running
+        conversation would never hit and would just evict reusable entries from the shared cache.
+        """
+        if use_cache is None:
+            use_cache = len(history or []) <= 1 and not summary
+        prompt, context = self._chat_prompt(history, language, summary)
+        await self._record_context(context)
+        return await self._generate("chat", "gemini-2.5-flash", prompt, language, use_cache)
+
+    async def chat_stream(self, history: list, language: str = "en", summary: str = None):
+        """
+        Same as `chat`, but yields the response text chunk by chunk as the model generates it.
+        """
+        prompt, context = self._chat_prompt(history, language, summary)
+        await self._record_context(context)
+        stream = await self.client.aio.models.generate_content_stream(
             model="gemini-2.5-flash",
             contents=[prompt]
         )
-        return response.text
-    
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
 
-    def speech_to_text(self, audio_bytes: bytes, language: str = "en") -> str:
+    async def summarize_history(self, messages: list, summary: str = None) -> str:
+        """
+        Fold older chat turns (and the previous summary, if any) into a short running summary.
+        """
+        conversation = "\n\n".join(
+            f"{msg.get('role', 'user').capitalize()}: {msg.get('content', '')}" for msg in messages
+        )
+        prompt = f"""
+            You are summarising a conversation between a farmer and a farming expert so it can be used as context later.
+            Keep every fact that matters for future advice: the farmer's crops, location, land, problems reported,
+            diagnoses and treatments suggested, and any decisions or preferences the farmer mentioned.
+            Write a compact summary in English of at most 200 words. Do not add anything that was not said.
+
+            Previous summary:
+            {summary or "None"}
+
+            New conversation turns:
+            {conversation}
+            """
+        response = await self.client.aio.models.generate_content(
+            model="gemini-2.0-flash",
+            contents=[prompt]
+        )
+        return response.text.strip()
+
+    async def schedule_compaction(self, user_id: str, history_length: int) -> None:
+        """
+        Queue a background compaction once a user's history grows past the configured threshold.
+        """
+        if history_length <= settings.chat_compaction_threshold:
+            return
+        if await self.redis_client.claim_compaction(user_id):
+            # imported here because lib.celery itself imports Bot
+            from lib.celery import compact_chat_history
+            try:
+                # publishing to the broker is blocking I/O, and the reply is already saved so a failure isn't fatal
+                await asyncio.to_thread(compact_chat_history.delay, user_id)
+            except Exception as e:
+                print(f"Error queueing chat compaction for {user_id}: {e}")
+                await self.redis_client.release_compaction(user_id)
+
+    async def speech_to_text(self, audio_bytes: bytes, language: str = "en") -> str:
         """convert speech to text using deepgram STT."""
         payload: FileSource = {
             "buffer": audio_bytes,
@@ -107,7 +219,7 @@ class Bot:
             language = "en"
         else:
             return "Sorry I don't understand your language."
-        response = self.deepgram_client.listen.rest.v("1").transcribe_file(
+        response = await self.deepgram_client.listen.asyncrest.v("1").transcribe_file(
             source=payload,
             options=PrerecordedOptions(
                 model="nova-2",
@@ -119,8 +231,10 @@ class Bot:
         return data
     
 
-    async def text_to_speech(self, text: str) -> bytes:
-        """Converts text to speech audio using gemini TTS, returns the file path of the saved audio"""
+    async def text_to_speech(
+        self, text: str, voice: str = settings.tts_voice, audio_format: str = settings.tts_audio_format
+    ) -> EncodedAudio:
+        """Converts text to speech audio using gemini TTS, returns the audio encoded in memory as `audio_format`"""
         response = await self.client.aio.models.generate_content(
             model="gemini-2.5-flash-preview-tts",
             contents=text,
@@ -129,50 +243,186 @@ class Bot:
                 speech_config=types.SpeechConfig(
                     voice_config=types.VoiceConfig(
                         prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                        voice_name='Kore',
+                        voice_name=voice,
                         )
                     )
                 ),
             )
         )
-        data = response.candidates[0].content.parts[0].inline_data.data
-        file_name = f"{str(uuid.uuid4())}.wav"
-
-        def wave_file(filename, pcm, channels=1, rate=24000, sample_width=2):
-            with wave.open(filename, "wb") as wf:
-                wf.setnchannels(channels)
-                wf.setsampwidth(sample_width)
-                wf.setframerate(rate)
-                wf.writeframes(pcm)
-        wave_file(file_name, data)
-
-        return file_name
+        pcm = response.candidates[0].content.parts[0].inline_data.data
+        return await asyncio.to_thread(encode_pcm, pcm, audio_format)
     
-    async def voice_chat(self, audio_bytes: bytes, user_id: str, language: str="en"):
-        """chat using voice input and output."""
-        user_text = self.speech_to_text(audio_bytes, language)
+    async def text_to_speech_stream(
+        self,
+        text: str,
+        voice: str = settings.tts_voice,
+        audio_format: str = settings.tts_audio_format,
+        concurrency: int = settings.tts_stream_concurrency,
+    ):
+        """
+        Synthesize `text` sentence by sentence, `concurrency` at a time, yielding (index, sentence, audio) in order.
+        """
+        async for item in stream_speech(GeminiTextToSpeech(self), text, voice, audio_format, concurrency):
+            yield item
+
+    async def speak(self, text: str, language: str = "en", voice: str = "", audio_format: str = "") -> dict:
+        """
+        Synthesize `text` into storage (or reuse the stored clip) and return {"audio_url", "content_type"}.
+        """
+        voice = voice or settings.tts_voice
+        audio_format = audio_format or settings.tts_audio_format
+        digest = audio_digest(text, voice, language, audio_format)
+
+        cached = await self.audio_cache.get(digest)
+        if cached:
+            try:
+                return {
+                    "audio_url": await create_presigned_url(cached["path"]),
+                    "content_type": cached["content_type"],
+                }
+            except Exception as e:
+                # the object is gone, synthesize it again
+                print(f"Error signing cached audio {cached['path']}: {e}")
+
+        audio = await self.text_to_speech(text, voice, audio_format)
+
+        # content-addressed, so a re-synthesized clip just replaces the old object
+        file_path = f"uploads/audio/tts/{digest}{audio.extension}"
+        await save_to_supabase(audio.data, file_path, content_type=audio.content_type, upsert=True)
+        await self.audio_cache.set(digest, file_path, audio.content_type)
+        return {
+            "audio_url": await create_presigned_url(file_path),
+            "content_type": audio.content_type,
+        }
+
+    async def _timed(self, name: str, timings: dict, awaitable):
+        async with timed(name, timings):
+            return await awaitable
+
+    async def _store_user_audio(self, audio_bytes: bytes, user_id: str, content_type: str) -> str:
+        file_path = f"uploads/audio/{user_id}_{uuid.uuid4()}"
+        await save_to_supabase(audio_bytes, file_path, content_type=content_type)
+        return await create_presigned_url(file_path)
+
+    async def _voice_reply(self, audio_bytes: bytes, user_id: str, language: str, timings: dict) -> tuple[str, str]:
+        """Transcribe a recording and answer it, returns (user text, reply text)"""
+        async with timed("voice_chat:stt", timings):
+            user_text = await self.speech_to_text(audio_bytes, language)
+        reply_text = await self._reply(user_text, user_id, language, timings, "voice_chat:chat")
+        return user_text, reply_text
+
+    async def _reply(self, user_text: str, user_id: str, language: str, timings: dict, metric: str) -> str:
+        """Add a spoken message to the history and answer it, timing the chat call under `metric`"""
         user_message = {
             "role": "user",
             "content": user_text
         }
-        self.redis_client.add_message(user_id, user_message)
-        history = self.redis_client.get_recent_messages(user_id, limit=10)
-        reply_text = await self.chat(history, language)
+        await self.redis_client.add_message(user_id, user_message)
+        history = await self.redis_client.get_recent_messages(user_id, limit=settings.chat_context_messages)
+        summary = await self.redis_client.get_summary(user_id)
+        async with timed(metric, timings):
+            return await self.chat(history, language, summary)
 
+    async def _save_reply(self, user_id: str, reply_text: str) -> None:
         assistant_message = {
             "role": "assistant",
             "content": reply_text
         }
-        self.redis_client.add_message(user_id, assistant_message)
+        history_length = await self.redis_client.add_message(user_id, assistant_message)
+        await self.schedule_compaction(user_id, history_length)
+
+    async def voice_chat(
+        self,
+        audio_bytes: bytes,
+        user_id: str,
+        language: str = "en",
+        content_type: str = "audio/wav",
+        voice: str = "",
+        audio_format: str = "",
+    ):
+        """
+        chat using voice input and output, returning once the whole reply clip is stored.
+        The recording is stored while it is transcribed. See `voice_chat_stream` to get the
+        text before the audio. Per-stage latencies (ms) are returned under "timings".
+        """
+        timings = {}
+        async with timed("voice_chat:total", timings):
+            upload = asyncio.create_task(
+                self._timed("voice_chat:upload", timings, self._store_user_audio(audio_bytes, user_id, content_type))
+            )
+            try:
+                user_text, reply_text = await self._voice_reply(audio_bytes, user_id, language, timings)
+            except BaseException:
+                upload.cancel()
+                raise
+
+            speech = asyncio.create_task(
+                self._timed("voice_chat:tts", timings, self.speak(reply_text, language, voice, audio_format))
+            )
+            await self._save_reply(user_id, reply_text)
+
+            user_audio, bot_audio = await asyncio.gather(upload, speech, return_exceptions=True)
+            if isinstance(user_audio, BaseException):
+                print(f"Error storing voice message: {user_audio}")
+                user_audio = None
+            if isinstance(bot_audio, BaseException):
+                print(f"Error synthesizing voice reply: {bot_audio}")
+                bot_audio = {}
 
         return{
             "user_query": user_text,
             "bot_reply": reply_text,
-            "user_audio_url": None,
-            "bot_audio_url": None,
+            "user_audio_url": user_audio,
+            "bot_audio_url": bot_audio.get("audio_url"),
+            "bot_audio_content_type": bot_audio.get("content_type"),
+            "timings": timings,
         }
 
-    async def create_notification_message(self, alert_data: dict, language: str = "en"):
+    async def voice_chat_stream(
+        self,
+        audio_bytes: bytes,
+        user_id: str,
+        language: str = "en",
+        content_type: str = "audio/wav",
+        voice: str = "",
+        audio_format: str = "",
+    ):
+        """
+        Same turn as `voice_chat`, as events: {"event": "reply"} with the texts as soon as the model
+        answers, then {"event": "audio"} per synthesized sentence (in order, see `stream_speech`),
+        then {"event": "done"} with the stored recording's URL and the stage timings.
+        """
+        timings = {}
+        started = time.perf_counter()
+        upload = asyncio.create_task(
+            self._timed("voice_chat:upload", timings, self._store_user_audio(audio_bytes, user_id, content_type))
+        )
+        try:
+            user_text, reply_text = await self._voice_reply(audio_bytes, user_id, language, timings)
+            yield {"event": "reply", "user_query": user_text, "bot_reply": reply_text}
+            await self._save_reply(user_id, reply_text)
+
+            async with timed("voice_chat:tts", timings):
+                async for index, sentence, audio in stream_speech(
+                    GeminiTextToSpeech(self), reply_text, voice or settings.tts_voice, audio_format or settings.tts_audio_format
+                ):
+                    if index == 0:
+                        timings["first_audio"] = round((time.perf_counter() - started) * 1000, 2)
+                    yield {"event": "audio", "index": index, "text": sentence, "audio": audio}
+        except BaseException:
+            upload.cancel()
+            raise
+
+        try:
+            user_audio = await upload
+        except Exception as e:
+            print(f"Error storing voice message: {e}")
+            user_audio = None
+        timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+        await record_latency("voice_chat:stream_total", timings["total"] / 1000)
+        yield {"event": "done", "user_audio_url": user_audio, "timings": timings}
+
+    async def create_notification_message(self, alert_data: dict, language: str = "en", use_cache: bool = True):
         """
         Create a notification message from the alert data.
         """
@@ -183,54 +433,75 @@ class Bot:
         The alert data is as follows:
         {alert_data}
         """
-        response = await self.client.aio.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=[prompt]
-        )
-        return response.text
+        return await self._generate("notification", "gemini-2.0-flash", prompt, language, use_cache)
 
-    async def translate_market_data(self, records: dict, language: str = "hindi"):
+    async def _translate_values(
+        self, namespace: str, values: list, language: str, description: str, use_cache: bool = True, casefold: bool = False
+    ) -> dict:
         """
-        Translate market data records to the given language.
+        Translate a set of short strings through the persistent per-language dictionary in Redis.
+        Values seen before are answered from it, the rest go to the model in a single call and are
+        added to the dictionary. Returns {value: translation} for every value that could be translated.
+        With `casefold` the dictionary is keyed case- and padding-insensitively, so "Partly Cloudy "
+        and "Partly cloudy" share one entry.
         """
+        def key(value: str) -> str:
+            return value.strip().casefold() if casefold else value
+
+        known = await self.redis_client.get_translations(namespace, language, list({key(value) for value in values}))
+        translations = {value: known[key(value)] for value in values if key(value) in known}
+        # one representative per dictionary key
+        missing = list({key(value): value for value in values if key(value) not in known}.values())
+        if not missing:
+            return translations
+
         prompt = f"""You are a translation expert that has knowledge about various languages.
-        You are given market data records that need to be translated.
-        You MUST translate ONLY the values of these specific fields to {language}:
-        - state
-        - district  
-        - market
-        - commodity
-        - variety
-        - grade
-        
-        DO NOT translate field names, dates, or prices.
-        Return the data as valid JSON array maintaining the exact same structure.
-        
-        The market data is:
-        {json.dumps(records, ensure_ascii=False)}
-        
-        Return ONLY the JSON array, no additional text or explanation.
+        You are given {description}. Translate each of them to {language_name(language)}.
+        Transliterate proper names (places, markets) rather than translating their meaning.
+
+        Return ONLY a JSON object mapping each given value, exactly as written, to its translation,
+        no additional text or explanation.
+
+        The values are:
+        {json.dumps(missing, ensure_ascii=False)}
         """
-        
+        def parse(text: str) -> dict:
+            # checked before caching, so a reply of the wrong shape is never stored
+            parsed = parse_json_response(text)
+            if not isinstance(parsed, dict):
+                raise ValueError(f"Expected a JSON object of translations, got {type(parsed).__name__}")
+            return parsed
+
+        learned = await self._generate(
+            namespace, "gemini-2.0-flash", prompt, language, use_cache, parse=parse
+        )
+        learned = {
+            key(value): translated for value, translated in learned.items()
+            if value in missing and isinstance(translated, str) and translated.strip()
+        }
+        await self.redis_client.set_translations(namespace, language, learned)
+        translations.update({value: learned[key(value)] for value in values if key(value) in learned})
+        return translations
+
+    async def translate_market_data(self, records: list, language: str = "hindi", use_cache: bool = True):
+        """
+        Translate market data records to the given language.
+        Only the distinct values of the text fields are translated (see `_translate_values`),
+        then the records are rebuilt locally.
+        """
+        fields = ("state", "district", "market", "commodity", "variety", "grade")
+        values = sorted({
+            record[field] for record in records for field in fields
+            if isinstance(record.get(field), str) and record[field].strip()
+        })
         try:
-            response = await self.client.aio.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=[prompt]
+            translations = await self._translate_values(
+                "market", values, normalize_language(language),
+                "names of Indian states, districts, markets (mandis), agricultural commodities, their varieties and grades",
+                use_cache,
             )
-            
-            # Clean the response text to ensure it's valid JSON
-            response_text = response.text.strip()
-            # Remove markdown code blocks if present
-            if response_text.startswith("```"):
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
-                response_text = response_text.strip()
-            
-            return json.loads(response_text)
         except json.JSONDecodeError as e:
             print(f"JSON decode error: {e}")
-            print(f"Response text: {response.text}")
             # Return original records if translation fails
             return records
         except Exception as e:
@@ -238,56 +509,64 @@ class Bot:
             # Return original records if any error occurs
             return records
 
-    async def translate_weather_data(self, weather_data: dict, language: str = "hindi"):
+        return [
+            {
+                key: translations.get(value, value) if key in fields and isinstance(value, str) else value
+                for key, value in record.items()
+            }
+            for record in records
+        ]
+
+    async def translate_weather_data(self, weather_data: dict, language: str = "hindi", use_cache: bool = True):
         """
-        Translate weather data to the given language.
+        Localize a formatted forecast to the given language without sending it to the model.
+        Condition texts, labels and place names come from the static table in lib.localization or the
+        Redis dictionary; only texts never seen before are looked up once through the model.
+        Digits are converted to the language's script.
         """
-        prompt = f"""You are a translation expert that has knowledge about various languages.
-        You are given weather data that need to be translated.
-        You MUST translate ONLY the values of these specific fields to {language}:
-        All the numerical values and text values in the weather data.
+        texts = weather_texts(weather_data)
+        # weatherapi isn't consistent about case ("Partly Cloudy" vs "Partly cloudy"), match case-insensitively
+        static = {text.casefold(): translated for text, translated in static_translations(language).items()}
+        translations = {text: static[text.casefold()] for text in texts if text.casefold() in static}
+        missing = sorted(texts - set(translations))
+        try:
+            if missing:
+                translations.update(await self._translate_values(
+                    "weather", missing, normalize_language(language),
+                    "weather condition descriptions, weather field labels, AM/PM markers and Indian place names",
+                    use_cache,
+                    casefold=True,
+                ))
+        except Exception as e:
+            print(f"Translation error: {e}")
+        return localize_weather(weather_data, translations, language)
+        
+    async def translate_content(self, content: str, language: str = "hindi", use_cache: bool = True):
         """
-        prompt += f"""
-        The weather data is:
-        {json.dumps(weather_data, ensure_ascii=False)}
+        Translate content to the given language, falls back to the original content on failure.
         """
         try:
-            response = await self.client.aio.models.generate_content(
-                model="gemini-2.0-flash",
-                    contents=[prompt]
-                )
-            # Clean the response text to ensure it's valid JSON
-            response_text = response.text.strip()
-            # Remove markdown code blocks if present
-            if response_text.startswith("```"):
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
-                response_text = response_text.strip()
-            return json.loads(response_text)  
+            return await self.translate_content_strict(content, language, use_cache)
         except Exception as e:
             print(f"Translation error: {e}")
-            return weather_data
-        
-    async def translate_content(self, content: str, language: str = "hindi"):
+            return content
+
+    async def translate_content_strict(self, content: str, language: str = "hindi", use_cache: bool = True):
         """
-        Translate content to the given language.
+        Same as `translate_content` but raises instead of returning the untranslated content,
+        for callers that store the result.
         """
+        def parse(text: str) -> str:
+            if not text or not text.strip():
+                raise ValueError("Empty translation")
+            return text.strip()
+
         prompt = f"""You are a translation expert that has knowledge about various languages.
         You are given content that need to be translated.
-        The content MUST be in the following language: {language}.
+        The content MUST be in the following language: {language_name(language)}.
         """
         prompt += f"""
         The content is:
         {content}
         """
-        try:
-            response = await self.client.aio.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=[prompt]
-            )
-            response_text = response.text.strip()
-            return response_text
-        except Exception as e:
-            print(f"Translation error: {e}")
-            return content
\ No newline at end of file
+        return await self._generate("translate", "gemini-2.0-flash", prompt, language, use_cache, parse=parse)
\ No newline at end of file
@@ -0,0 +1,104 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Dict, Optional
+
+from config.settings import settings
+
+TRUNCATION_MARKER = " ...[truncated]"
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+# below this many tokens a truncated message isn't worth keeping
+MIN_MESSAGE_TOKENS = 16
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: ~4 bytes of UTF-8 per token.
+
+    Indic scripts take 3 bytes per character in UTF-8, which lines up with
+    them tokenising more densely than English, so one rule covers both.
+    """
+    return (len(text.encode("utf-8")) + 3) // 4
+
+@dataclass
+class ConversationContext:
+    """The packed prompt context and what it cost"""
+    text: str
+    token_budget: int
+    tokens_used: int
+    messages_used: int
+    messages_truncated: int = 0
+    messages_dropped: int = 0
+
+class ContextBuilder:
+    """Packs chat history newest-first into a fixed token budget.
+
+    Token counts are cached per message id so a message is only measured
+    once however many turns it stays in the window.
+    """
+    def __init__(
+        self,
+        token_budget: int = settings.chat_context_token_budget,
+        message_token_limit: int = settings.chat_message_token_limit,
+        cache_size: int = 10000,
+    ):
+        self.token_budget = token_budget
+        self.message_token_limit = message_token_limit
+        self.cache_size = cache_size
+        self._token_counts: OrderedDict[str, int] = OrderedDict()
+
+    def count_tokens(self, message: Dict) -> int:
+        message_id = message.get('id')
+        if message_id is None:
+            return estimate_tokens(message.get('content', ''))
+        if message_id in self._token_counts:
+            self._token_counts.move_to_end(message_id)
+            return self._token_counts[message_id]
+
+        tokens = estimate_tokens(message.get('content', ''))
+        self._token_counts[message_id] = tokens
+        if len(self._token_counts) > self.cache_size:
+            self._token_counts.popitem(last=False)
+        return tokens
+
+    def truncate(self, content: str, max_tokens: int) -> str:
+        """Cut `content` down to roughly `max_tokens`, keeping the start"""
+        max_bytes = max(max_tokens * 4 - len(TRUNCATION_MARKER), 0)
+        return content.encode("utf-8")[:max_bytes].decode("utf-8", errors="ignore") + TRUNCATION_MARKER
+
+    def build(self, history: List[Dict], summary: Optional[str] = None) -> ConversationContext:
+        remaining = self.token_budget
+        summary_line = ""
+        if summary:
+            # the summary gets at most half the budget, the rest is kept for the latest turns
+            limit = self.token_budget // 2 - estimate_tokens(SUMMARY_PREFIX)
+            if estimate_tokens(summary) > limit:
+                summary = self.truncate(summary, limit) if limit >= MIN_MESSAGE_TOKENS else ""
+            if summary:
+                summary_line = f"{SUMMARY_PREFIX}{summary}\n\n"
+                remaining -= estimate_tokens(summary_line)
+
+        lines = []
+        truncated = 0
+        for msg in reversed(history or []):
+            role = msg.get('role', 'user').capitalize()
+            content = msg.get('content', '')
+            tokens = self.count_tokens(msg)
+            # The latest message is always kept, oversized ones are cut down to size
+            limit = min(self.message_token_limit, remaining if lines else max(remaining, MIN_MESSAGE_TOKENS))
+            if tokens > limit:
+                if limit < MIN_MESSAGE_TOKENS:
+                    break
+                content = self.truncate(content, limit)
+                tokens = limit
+                truncated += 1
+            if lines and tokens > remaining:
+                break
+            lines.append(f"{role}: {content}\n\n")
+            remaining -= tokens
+
+        return ConversationContext(
+            text=summary_line + "".join(reversed(lines)),
+            token_budget=self.token_budget,
+            tokens_used=self.token_budget - remaining,
+            messages_used=len(lines),
+            messages_truncated=truncated,
+            messages_dropped=len(history or []) - len(lines),
+        )
@@ -0,0 +1,170 @@
+import asyncio
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from deepgram import DeepgramClient, LiveOptions, LiveTranscriptionEvents
+
+from config.settings import settings
+from lib.audio import EncodedAudio, split_sentences
+
+@dataclass
+class Transcript:
+    """A piece of live transcription"""
+    text: str
+    # the text of this segment won't change any more
+    is_final: bool = False
+    # the speaker paused, everything finalized so far is one utterance
+    end_of_speech: bool = False
+
+class TranscriptionSession(ABC):
+    """One live audio stream: feed it with `send` and read `transcripts` until it closes.
+
+    Engines push results with `put`; `put(None)` ends the stream.
+    """
+    def __init__(self):
+        self.queue: asyncio.Queue[Optional[Transcript]] = asyncio.Queue()
+
+    def put(self, transcript: Optional[Transcript]) -> None:
+        self.queue.put_nowait(transcript)
+
+    @abstractmethod
+    async def send(self, audio: bytes) -> None:
+        ...
+
+    @abstractmethod
+    async def flush(self) -> None:
+        """The speaker is done (push-to-talk release), finalize what's pending and end the utterance"""
+
+    async def keep_alive(self) -> None:
+        """Called periodically while no audio is sent (during a reply), for engines that drop idle streams"""
+
+    async def close(self) -> None:
+        self.put(None)
+
+    async def transcripts(self) -> AsyncIterator[Transcript]:
+        while (transcript := await self.queue.get()) is not None:
+            yield transcript
+
+class SpeechToText(ABC):
+    """Interface for streaming speech recognition, see `DeepgramSpeechToText`"""
+    @abstractmethod
+    async def open(self, language: str, sample_rate: int) -> TranscriptionSession:
+        ...
+
+class TextToSpeech(ABC):
+    """Interface for speech synthesis, see `GeminiTextToSpeech`"""
+    @abstractmethod
+    async def synthesize(self, text: str, voice: str, audio_format: str) -> EncodedAudio:
+        ...
+
+##### DEEPGRAM #####
+
+class DeepgramTranscriptionSession(TranscriptionSession):
+    def __init__(self, connection):
+        super().__init__()
+        self.connection = connection
+
+    async def send(self, audio: bytes) -> None:
+        await self.connection.send(audio)
+
+    async def flush(self) -> None:
+        await self.connection.finalize()
+
+    async def keep_alive(self) -> None:
+        # Deepgram closes a stream after about 10s without audio
+        await self.connection.keep_alive()
+
+    async def close(self) -> None:
+        try:
+            await self.connection.finish()
+        finally:
+            await super().close()
+
+class DeepgramSpeechToText(SpeechToText):
+    """Deepgram live transcription of 16-bit mono PCM.
+
+    End of speech is Deepgram's endpointing (`speech_final`), a finalize
+    request from `flush`, or an UtteranceEnd event when the pause detection
+    misses because of background noise.
+    """
+    def __init__(self, client: DeepgramClient = None, model: str = "nova-2"):
+        self.client = client or DeepgramClient(api_key=settings.deepgram_api_key)
+        self.model = model
+
+    async def open(self, language: str, sample_rate: int) -> TranscriptionSession:
+        connection = self.client.listen.asyncwebsocket.v("1")
+        session = DeepgramTranscriptionSession(connection)
+
+        async def on_transcript(_, result, **kwargs):
+            text = result.channel.alternatives[0].transcript
+            end_of_speech = bool(result.speech_final or getattr(result, "from_finalize", False))
+            session.put(Transcript(text, bool(result.is_final), end_of_speech))
+
+        async def on_utterance_end(_, utterance_end, **kwargs):
+            session.put(Transcript("", is_final=True, end_of_speech=True))
+
+        async def on_close(_, close, **kwargs):
+            session.put(None)
+
+        async def on_error(_, error, **kwargs):
+            print(f"Deepgram live error: {error}")
+            session.put(None)
+
+        connection.on(LiveTranscriptionEvents.Transcript, on_transcript)
+        connection.on(LiveTranscriptionEvents.UtteranceEnd, on_utterance_end)
+        connection.on(LiveTranscriptionEvents.Close, on_close)
+        connection.on(LiveTranscriptionEvents.Error, on_error)
+
+        options = LiveOptions(
+            model=self.model,
+            language=language,
+            encoding="linear16",
+            sample_rate=sample_rate,
+            channels=1,
+            smart_format=True,
+            interim_results=True,
+            endpointing=settings.realtime_endpointing_ms,
+            utterance_end_ms=settings.realtime_utterance_end_ms,
+        )
+        if not await connection.start(options):
+            raise RuntimeError("Could not start Deepgram live transcription")
+        return session
+
+##### GEMINI #####
+
+class GeminiTextToSpeech(TextToSpeech):
+    """Gemini TTS through `Bot.text_to_speech`"""
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def synthesize(self, text: str, voice: str, audio_format: str) -> EncodedAudio:
+        return await self.bot.text_to_speech(text, voice, audio_format)
+
+async def stream_speech(
+    tts: TextToSpeech,
+    text: str,
+    voice: str = settings.tts_voice,
+    audio_format: str = settings.tts_audio_format,
+    concurrency: int = settings.tts_stream_concurrency,
+):
+    """
+    Synthesize `text` sentence by sentence, `concurrency` at a time, yielding (index, sentence, audio) in order.
+    The first clip is ready after one sentence's synthesis instead of the whole reply's.
+    """
+    sentences = split_sentences(text)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def synthesize(sentence: str) -> EncodedAudio:
+        async with semaphore:
+            return await tts.synthesize(sentence, voice, audio_format)
+
+    tasks = [asyncio.create_task(synthesize(sentence)) for sentence in sentences]
+    try:
+        for index, (sentence, task) in enumerate(zip(sentences, tasks)):
+            yield index, sentence, await task
+    finally:
+        # the consumer went away or a sentence failed, don't keep synthesizing the rest
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 class MarketDataRequest(BaseModel):
@@ -11,6 +11,14 @@ class MarketDataRequest(BaseModel):
     grade: str = ""
     offset: int = 0
     language: str = "en"
+
+class MarketAnalyticsRequest(BaseModel):
+    state: str
+    commodity: str
+    variety: str = ""
+    market: str = ""
+    district: str = ""
+    days: int = Field(default=365, ge=14, le=730)
     
 class ChatRequest(BaseModel):
     message: str
@@ -22,6 +30,8 @@ class TTSRequest(BaseModel):
     message_id: str
     message: str
     language: str = "en"
+    voice: str = ""
+    audio_format: str = ""  # "opus", "mp3" or "wav", defaults to settings.tts_audio_format
 
 class CreateFarmerRequest(BaseModel):
     name: str
@@ -120,9 +120,20 @@ class ChatClearResponse(BaseResponse):
     user_id: str
     message: str = "Chat history cleared successfully"
 
+class VoiceChatResponse(BaseModel):
+    """Response for a voice chat turn, `timings` are per-stage latencies in ms"""
+    user_id: str
+    user_query: str
+    bot_reply: str
+    user_audio_url: Optional[str] = None
+    bot_audio_url: Optional[str] = None
+    bot_audio_content_type: Optional[str] = None
+    timings: Dict[str, float] = {}
+
 class TTSResponse(BaseModel):
     """Response for TTS"""
     audio_url: str
+    content_type: str = "audio/x-wav"
 
 # Market data response models
 class MarketRecord(BaseModel):
@@ -145,6 +156,37 @@ class MarketDataResponse(BaseModel):
     count: int
     message: str
 
+class BestMarket(BaseModel):
+    """Market paying the highest recent modal price"""
+    district: str
+    market: str
+    variety: str
+    modal_price: Optional[float] = None
+    arrival_date: str
+
+class PricePoint(BaseModel):
+    """Daily modal price with its 7 day moving average"""
+    date: str
+    modal_price: Optional[float] = None
+    moving_average_7d: Optional[float] = None
+
+class MarketAnalyticsResponse(BaseModel):
+    """Response for mandi price analytics"""
+    state: str
+    commodity: str
+    variety: str = ""
+    market: str = ""
+    as_of: Optional[str] = None
+    latest_modal_price: Optional[float] = None
+    moving_average_7d: Optional[float] = None
+    moving_average_30d: Optional[float] = None
+    week_over_week_change_pct: Optional[float] = None
+    percentile_rank: Optional[float] = None
+    percentiles: Dict[str, Optional[float]] = {}
+    best_market: Optional[BestMarket] = None
+    markets_compared: int = 0
+    history: List[PricePoint] = []
+
 # Weather response models
 class WeatherLocation(BaseModel):
     """Weather location data"""
@@ -1,27 +1,39 @@
-import os
-import uuid
-from fastapi import APIRouter, Query, Form, Depends, UploadFile, File
+import json
+import time
+import base64
+import asyncio
+from fastapi import APIRouter, Query, Form, Depends, UploadFile, File, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 
 from agent.bot import Bot
-from lib.redis import Redis
+from agent.speech import SpeechToText, TextToSpeech, TranscriptionSession, DeepgramSpeechToText, GeminiTextToSpeech, stream_speech
+from lib.redis import AsyncRedis
+from lib.metrics import record_latency, timed
+from lib.localization import normalize_language
+from config.settings import settings
 from api.models.requests import ChatRequest, TTSRequest
 from api.models.responses import ( 
     ChatMessageResponse,
     ChatHistoryResponse,
     ChatClearResponse,
-    TTSResponse
-)
-from lib.db import (
-    save_to_supabase,
-    create_message,
-    get_message,
-    create_presigned_url
+    TTSResponse,
+    VoiceChatResponse
 )
+from lib.db import create_presigned_url
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 bot = Bot()
-redis_client = Redis()
+redis_client = AsyncRedis()
+speech_to_text = DeepgramSpeechToText(bot.deepgram_client)
+text_to_speech = GeminiTextToSpeech(bot)
+
+# Engines for /chat/realtime, override these dependencies to run it against other (or fake) backends
+def get_speech_to_text() -> SpeechToText:
+    return speech_to_text
+
+def get_text_to_speech() -> TextToSpeech:
+    return text_to_speech
 
 @router.post("/message", response_model=ChatMessageResponse)
 async def chat(request: ChatRequest) -> ChatMessageResponse:
@@ -30,30 +42,74 @@ async def chat(request: ChatRequest) -> ChatMessageResponse:
         "role": "user",
         "content": request.message
     }
-    redis_client.add_message(request.user_id, user_message)
-    history = redis_client.get_recent_messages(request.user_id, limit=10)
+    await redis_client.add_message(request.user_id, user_message)
+    history = await redis_client.get_recent_messages(request.user_id, limit=settings.chat_context_messages)
+    summary = await redis_client.get_summary(request.user_id)
     
-    response = await bot.chat(history, request.language)
+    response = await bot.chat(history, request.language, summary)
     
     # Add assistant response to history
     assistant_message = {
         "role": "assistant",
         "content": response
     }
-    redis_client.add_message(request.user_id, assistant_message)
+    history_length = await redis_client.add_message(request.user_id, assistant_message)
+    await bot.schedule_compaction(request.user_id, history_length)
     
     return ChatMessageResponse(
         response=response,
         user_id=request.user_id
     )
 
+@router.post("/message/stream")
+async def chat_stream(request: ChatRequest) -> StreamingResponse:
+    """Same as /chat/message but streams the reply as server-sent events.
+
+    Each chunk is sent as a `data: {"delta": ...}` event, followed by a final
+    `done` event carrying the full response once it has been saved to history.
+    """
+    user_message = {
+        "role": "user",
+        "content": request.message
+    }
+    await redis_client.add_message(request.user_id, user_message)
+    history = await redis_client.get_recent_messages(request.user_id, limit=settings.chat_context_messages)
+    summary = await redis_client.get_summary(request.user_id)
+
+    async def events():
+        chunks = []
+        try:
+            async for delta in bot.chat_stream(history, request.language, summary):
+                chunks.append(delta)
+                yield f"data: {json.dumps({'delta': delta}, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            print(f"Chat stream error: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': 'Failed to generate response'})}\n\n"
+            return
+
+        response = "".join(chunks)
+        assistant_message = {
+            "role": "assistant",
+            "content": response
+        }
+        history_length = await redis_client.add_message(request.user_id, assistant_message)
+        await bot.schedule_compaction(request.user_id, history_length)
+        done = {"response": response, "user_id": request.user_id}
+        yield f"event: done\ndata: {json.dumps(done, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/history/{user_id}", response_model=ChatHistoryResponse)
 async def get_chat_history(user_id: str, limit: int = Query(default=None)) -> ChatHistoryResponse:
     """Get chat history for a user"""
     if limit:
-        messages = redis_client.get_recent_messages(user_id, limit=limit)
+        messages = await redis_client.get_recent_messages(user_id, limit=limit)
     else:
-        messages = redis_client.get_chat_history(user_id)
+        messages = await redis_client.get_chat_history(user_id)
     # Convert any file: URLs to signed URLs
     for message in messages:
         if message['content'].startswith("file:"):
@@ -71,60 +127,243 @@ async def get_chat_history(user_id: str, limit: int = Query(default=None)) -> Ch
     )
 
 
-@router.post("/voice")
+@router.post("/voice", response_model=VoiceChatResponse)
 async def voice_chat(
     audio: UploadFile = File(...),
     user_id: str = Form(...),
-    language: str = Form(default="en", examples=["en", "hi"])
-):
+    language: str = Form(default="en", examples=["en", "hi"]),
+    audio_format: str = Form(default="")
+) -> VoiceChatResponse:
     """voice chatting with the bot where the user uploads audio and bot replies with text and audio"""
     audio_bytes = await audio.read()
-    result = await bot.voice_chat(audio_bytes, user_id=user_id, language=language)
-    return {
-        "user_id": user_id,
-        "user_query": result["user_query"],
-        "bot_reply": result["bot_reply"]
-    }
+    result = await bot.voice_chat(
+        audio_bytes,
+        user_id=user_id,
+        language=language,
+        content_type=audio.content_type or "application/octet-stream",
+        audio_format=audio_format,
+    )
+    return VoiceChatResponse(
+        user_id=user_id,
+        **result
+    )
+
+
+@router.post("/voice/stream")
+async def voice_chat_stream(
+    audio: UploadFile = File(...),
+    user_id: str = Form(...),
+    language: str = Form(default="en", examples=["en", "hi"]),
+    audio_format: str = Form(default="")
+) -> StreamingResponse:
+    """Same as /chat/voice but streams server-sent events, so the text arrives before any audio.
+
+    A `reply` event carries user_query and bot_reply as soon as the model answers. Each
+    synthesized sentence follows as a `data: {"index", "text", "audio", "content_type"}`
+    event with base64 audio that plays on its own. A final `done` event carries
+    user_audio_url and the per-stage timings in ms.
+    """
+    audio_bytes = await audio.read()
+    turn = bot.voice_chat_stream(
+        audio_bytes,
+        user_id=user_id,
+        language=language,
+        content_type=audio.content_type or "application/octet-stream",
+        audio_format=audio_format,
+    )
+
+    async def events():
+        try:
+            async for event in turn:
+                kind = event.pop("event")
+                if kind == "audio":
+                    audio = event.pop("audio")
+                    event["audio"] = base64.b64encode(audio.data).decode("ascii")
+                    event["content_type"] = audio.content_type
+                    yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+                else:
+                    yield f"event: {kind}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            print(f"Voice stream error: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': 'Failed to answer voice message'})}\n\n"
+        finally:
+            # the client may have gone away mid-stream, stop synthesizing and cancel the upload
+            await turn.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.post("/tts", response_model=TTSResponse)
 async def tts_message(request: TTSRequest) -> TTSResponse:
-    """voice chatting with the bot where the user uploads audio and bot replies with text and audio"""
-    # Placeholder name for the audio file
-    audio_file = None
+    """Speak a bot message, replies already synthesized are served from storage"""
+    speech = await bot.speak(request.message, request.language, request.voice, request.audio_format)
+    return TTSResponse(**speech)
+
+
+@router.post("/tts/stream")
+async def tts_stream(request: TTSRequest) -> StreamingResponse:
+    """Speak a bot message sentence by sentence as server-sent events.
+
+    Each clip is sent as soon as it (and every clip before it) is ready, as a
+    `data: {"index", "text", "audio", "content_type"}` event with base64 audio
+    that plays on its own. A final `done` event carries the number of clips.
+    """
+    voice = request.voice or settings.tts_voice
+    audio_format = request.audio_format or settings.tts_audio_format
+
+    async def events():
+        count = 0
+        try:
+            async for index, sentence, audio in bot.text_to_speech_stream(request.message, voice, audio_format):
+                chunk = {
+                    "index": index,
+                    "text": sentence,
+                    "audio": base64.b64encode(audio.data).decode("ascii"),
+                    "content_type": audio.content_type,
+                }
+                count += 1
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            print(f"TTS stream error: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': 'Failed to synthesize speech'})}\n\n"
+            return
+        yield f"event: done\ndata: {json.dumps({'chunks': count})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def realtime_turn(
+    websocket: WebSocket,
+    tts: TextToSpeech,
+    user_id: str,
+    user_text: str,
+    language: str,
+    voice: str,
+    audio_format: str,
+) -> None:
+    """Answer one utterance: chat reply as text first, then its audio sentence by sentence"""
+    timings = {}
+    started = time.perf_counter()
+    async with timed("realtime:total", timings):
+        reply_text = await bot._reply(user_text, user_id, language, timings, "realtime:chat")
+        await websocket.send_json({"type": "reply", "user_query": user_text, "bot_reply": reply_text})
+        await bot._save_reply(user_id, reply_text)
+
+        async with timed("realtime:tts", timings):
+            async for index, sentence, audio in stream_speech(tts, reply_text, voice, audio_format):
+                if index == 0:
+                    timings["first_audio"] = round((time.perf_counter() - started) * 1000, 2)
+                    await record_latency("realtime:first_audio", timings["first_audio"] / 1000)
+                await websocket.send_json({"type": "audio", "index": index, "text": sentence, "content_type": audio.content_type})
+                await websocket.send_bytes(audio.data)
+    await websocket.send_json({"type": "turn_end", "timings": timings})
+
+
+async def keep_session_alive(session: TranscriptionSession) -> None:
+    """Ping the transcription stream until cancelled, the client may send no audio while it listens to a reply"""
+    while True:
+        await asyncio.sleep(settings.realtime_keepalive_seconds)
+        try:
+            await session.keep_alive()
+        except Exception as e:
+            print(f"Error keeping transcription session alive: {e}")
+            return
+
+
+@router.websocket("/realtime")
+async def realtime_voice(
+    websocket: WebSocket,
+    user_id: str,
+    language: str = "en",
+    sample_rate: int = 16000,
+    voice: str = "",
+    audio_format: str = "",
+    stt: SpeechToText = Depends(get_speech_to_text),
+    tts: TextToSpeech = Depends(get_text_to_speech),
+):
+    """Real-time voice conversation.
+
+    The client streams 16-bit mono PCM at `sample_rate` as binary frames and
+    may send a `{"type": "end"}` text frame to end an utterance (push to
+    talk); otherwise a pause ends it. The server sends JSON text frames:
+    `transcript` (text, is_final) while the farmer speaks, `reply` once the
+    chat turn is done, one `audio` header (index, text, content_type)
+    followed by a binary frame per synthesized sentence, and `turn_end`
+    with per-stage timings in ms.
+    """
+    await websocket.accept()
+    voice = voice or settings.tts_voice
+    audio_format = audio_format or settings.tts_audio_format
+    try:
+        session = await stt.open(normalize_language(language), sample_rate)
+    except Exception as e:
+        print(f"Error opening transcription session: {e}")
+        await websocket.close(code=1011)
+        return
+
+    async def receive_audio():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                await session.send(message["bytes"])
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    continue
+                if control.get("type") == "end":
+                    await session.flush()
+
+    async def converse():
+        segments = []
+        async for transcript in session.transcripts():
+            if transcript.text:
+                await websocket.send_json({"type": "transcript", "text": transcript.text, "is_final": transcript.is_final})
+                if transcript.is_final:
+                    segments.append(transcript.text)
+            if transcript.end_of_speech and segments:
+                # audio keeps being transcribed (and queued) while the reply is produced
+                user_text, segments = " ".join(segments), []
+                keepalive = asyncio.create_task(keep_session_alive(session))
+                try:
+                    await realtime_turn(websocket, tts, user_id, user_text, language, voice, audio_format)
+                finally:
+                    keepalive.cancel()
 
+    tasks = [asyncio.create_task(receive_audio()), asyncio.create_task(converse())]
     try:
-        # TODO: for future use
-        # Check if message is already TTS'd
-        # message = await get_message(request.message_id, content_type="audio/x-wav")
-        # if message:
-        #     response = await create_presigned_url(message.content)
-        #     return TTSResponse(
-        #         audio_url=response
-        #     )
-        
-        # If message is not TTS'd, generate TTS and save to supabase
-        audio_file = await bot.text_to_speech(request.message)
-
-        file_path = f"uploads/audio/{str(uuid.uuid4())}_{request.language}.wav"
-        await save_to_supabase(audio_file, file_path, content_type="audio/x-wav")
-
-        response = await create_presigned_url(file_path)
-
-        # await create_message(request.user_id, request.message_id, "assistant", file_path, "audio/x-wav")
-
-        return TTSResponse(
-            audio_url=response
-        )
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                print(f"Realtime voice error: {task.exception()}")
     finally:
-        if audio_file:
-            os.remove(audio_file)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            await session.close()
+        except Exception as e:
+            print(f"Error closing transcription session: {e}")
+        try:
+            await websocket.close()
+        except RuntimeError:
+            pass
 
 
 @router.delete("/delete/{user_id}", response_model=ChatClearResponse)
-def clear_chat_history(user_id: str) -> ChatClearResponse:
+async def clear_chat_history(user_id: str) -> ChatClearResponse:
     """Clear chat history for a user"""
-    redis_client.clear_chat_history(user_id)
+    await redis_client.clear_chat_history(user_id)
     return ChatClearResponse(
         user_id=user_id,
         message="Chat history cleared successfully"
@@ -1,13 +1,13 @@
-import os
 import uuid
 import asyncio
-import tempfile
 from fastapi import APIRouter, File, UploadFile, Form, HTTPException
 from inference_sdk import InferenceHTTPClient
 
 from agent.bot import Bot
-from lib.redis import Redis
+from lib.redis import AsyncRedis
 from lib.db import save_to_supabase
+from lib.metrics import timed
+from lib.images import preprocess_image, diagnosis_cache
 from config.settings import settings
 from api.models.responses import ImageDetectionResponse
 
@@ -19,7 +19,12 @@ client = InferenceHTTPClient(
 
 router = APIRouter(prefix="/image_detection", tags=["image_detection"])
 bot = Bot()
-redis_client = Redis()
+redis_client = AsyncRedis()
+
+async def timed_stage(stage: str, awaitable):
+    """Await `awaitable`, recording its latency under metrics:latency:image_detection:{stage}"""
+    async with timed(f"image_detection:{stage}"):
+        return await awaitable
 
 @router.post("/detect", response_model=ImageDetectionResponse)
 async def image_detection(
@@ -27,35 +32,49 @@ async def image_detection(
     language: str = Form("en"),
     user_id: str = Form(...)
 ) -> ImageDetectionResponse:
-    # Read the image content
-    image_content = await image.read()
-    
-    # Create a temporary file with appropriate extension
-    file_extension = ""
-    if image.filename and "." in image.filename:
-        file_extension = f".{image.filename.split('.')[-1]}"
-    
-    with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
-        tmp_file.write(image_content)
-        tmp_file_path = tmp_file.name
+    # Decode, orient and shrink the photo once; every stage below shares the compact encoding
+    try:
+        processed = await timed_stage("preprocess", asyncio.to_thread(preprocess_image, await image.read()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Uploaded file is not a valid image")
+
+    # Upload image to Supabase while inference and analysis run
+    file_id = f"uploads/{user_id}_{uuid.uuid4()}{processed.extension}"
+    upload = asyncio.create_task(
+        timed_stage("upload", save_to_supabase(processed.data, file_id, content_type=processed.content_type))
+    )
 
     try:
-        # Run the workflow with the file path
-        result = client.run_workflow(
-            workspace_name="sih-n7y20",
-            workflow_id="plant-and-disease-workflow",
-            images={
-                "image": tmp_file_path
-            },
-            use_cache=True # cache workflow definition for 15 minutes
-        )
+        # Resubmitted (or nearly identical) photos reuse an earlier diagnosis
+        cached = await diagnosis_cache.get(processed.phash, language)
+        if cached and cached.analysis:
+            analysis = cached.analysis
+        else:
+            if cached:
+                result = cached.result
+            else:
+                # The Roboflow client is synchronous, run it in a worker thread so the event loop stays free
+                result = await timed_stage("inference", asyncio.to_thread(
+                    client.run_workflow,
+                    workspace_name="sih-n7y20",
+                    workflow_id="plant-and-disease-workflow",
+                    images={
+                        "image": processed.image
+                    },
+                    use_cache=True # cache workflow definition for 15 minutes
+                ))
 
-        # Analyse the output
-        analysis = await bot.analyse_output(result, tmp_file_path, language)
+            # Analyse the output
+            analysis = await timed_stage("analysis", bot.analyse_output(
+                result, processed.data, language, mime_type=processed.content_type
+            ))
+            await diagnosis_cache.set(cached.phash if cached else processed.phash, language, result, analysis)
 
-        # Upload image to Supabase using a valid key
-        file_id = f"uploads/{user_id}_{uuid.uuid4()}{file_extension}"
-        response = await save_to_supabase(tmp_file_path, file_id, content_type="image/jpeg")
+        try:
+            response = await upload
+        except Exception as e:
+            print(f"Error uploading image: {e}")
+            response = None
 
         if response:
             user_message = {
@@ -66,14 +85,16 @@ async def image_detection(
                 "role": "assistant",
                 "content": analysis
             }
-            redis_client.add_message(user_id, [user_message, assistant_message])
+            history_length = await redis_client.add_message(user_id, [user_message, assistant_message])
+            await bot.schedule_compaction(user_id, history_length)
 
         return ImageDetectionResponse(
             analysis=analysis,
             language=language,
             user_id=user_id
         )
-    finally:
-        # Clean up the temporary file
-        if os.path.exists(tmp_file_path):
-            os.remove(tmp_file_path)
+    except BaseException:
+        # Don't leave an orphaned upload running if inference or analysis failed
+        if not upload.done():
+            upload.cancel()
+        raise
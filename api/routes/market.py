@@ -1,48 +1,29 @@
-import requests
-from fastapi import APIRouter
+import httpx
+from fastapi import APIRouter, HTTPException
 
 from agent.bot import Bot
-from config.settings import settings
-from api.models.requests import MarketDataRequest
-from api.models.responses import MarketDataResponse
+from lib.mandi import FILTER_FIELDS, query_prices, fetch_upstream
+from lib.price_analytics import price_series_store, analyse
+from api.models.requests import MarketDataRequest, MarketAnalyticsRequest
+from api.models.responses import MarketDataResponse, MarketAnalyticsResponse
 
 router = APIRouter(prefix="/market", tags=["market"])
 bot = Bot()
 
 @router.post("/get")
 async def get_market_data(request: MarketDataRequest):
-    base_url = "https://api.data.gov.in/resource/9ef84268-d588-465a-a308-a864a43d0070"
-    params = {
-        "api-key": settings.ogd_api_key,
-        "format": "json",
-    }
-    
-    # Add optional parameters
-    if request.limit:
-        params["limit"] = request.limit
-    if request.offset:
-        params["offset"] = request.offset
-    
-    # Add filters with correct format
-    if request.state:
-        params["filters[state.keyword]"] = request.state
-    if request.district:
-        params["filters[district]"] = request.district
-    if request.market:
-        params["filters[market]"] = request.market
-    if request.commodity:
-        params["filters[commodity]"] = request.commodity
-    if request.variety:
-        params["filters[variety]"] = request.variety
-    if request.grade:
-        params["filters[grade]"] = request.grade
+    filters = {field: getattr(request, field) for field in FILTER_FIELDS}
     
     try:
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()  # Raise an error for bad status codes
-        
-        data = response.json()
-        records = data.get("records", [])
+        # Serve from the local mirror, only go to data.gov.in when it has nothing for this query
+        try:
+            records = await query_prices(filters, request.limit, request.offset)
+        except Exception as e:
+            print(f"Mandi mirror error: {e}")
+            records = []
+        if not records:
+            data = await fetch_upstream(filters, request.limit, request.offset)
+            records = data.get("records", [])
         
         # Translate if needed
         if request.language != "en":
@@ -54,7 +35,7 @@ async def get_market_data(request: MarketDataRequest):
             count=len(records),
             message=f"Found {len(records)} market records"
         )
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         return MarketDataResponse(
             status="error",
             records=[],
@@ -68,3 +49,20 @@ async def get_market_data(request: MarketDataRequest):
             count=0,
             message=f"An error occurred: {str(e)}"
         )
+
+@router.post("/analytics", response_model=MarketAnalyticsResponse)
+async def get_market_analytics(request: MarketAnalyticsRequest) -> MarketAnalyticsResponse:
+    """Price trend for a commodity from the local mandi mirror: "is today's price good?"."""
+    series = await price_series_store.get(request.state, request.commodity, request.variety, request.days)
+    stats = analyse(series, request.market, request.district)
+    if not stats:
+        raise HTTPException(status_code=404, detail="No price history for this commodity")
+    if request.market and not stats["market"]:
+        # don't pass state-wide numbers off as this mandi's
+        raise HTTPException(status_code=404, detail="No price history for this market")
+    return MarketAnalyticsResponse(
+        state=request.state,
+        commodity=request.commodity,
+        variety=request.variety,
+        **stats
+    )
@@ -1,7 +1,7 @@
-import json
+import asyncio
 from fastapi import APIRouter, HTTPException
 
-from agent.bot import Bot
+from lib.celery import translate_post
 from api.models.requests import CreatePostRequest, LikeDislikePostRequest
 from api.models.responses import (
     PostResponse, 
@@ -15,11 +15,11 @@ from lib.db import (
     get_all_posts, 
     like_post, 
     dislike_post,
-    get_farmer
+    get_farmer,
+    localize_post
 )
 
 router = APIRouter(prefix="/posts", tags=["posts"])
-bot = Bot()
 
 @router.post("/create", response_model=PostResponse)
 async def create(post: CreatePostRequest) -> PostResponse:
@@ -31,11 +31,19 @@ async def create(post: CreatePostRequest) -> PostResponse:
         post.user_id,
         post.content_url,
         post.content_desc,
+        user.language,
     )
 
     if not created_post:
         raise HTTPException(status_code=400, detail="Failed to create post")
-    return created_post
+
+    # Translations are produced once, in the background, instead of on every feed read
+    try:
+        # publishing to the broker is blocking I/O
+        await asyncio.to_thread(translate_post.delay, created_post.id)
+    except Exception as e:
+        print(f"Error queueing translation of post {created_post.id}: {e}")
+    return localize_post(created_post, user.language)
 
 @router.delete("/delete/{post_id}", response_model=PostDeleteResponse)
 async def delete(post_id: str, user_id: str) -> PostDeleteResponse:
@@ -46,10 +54,7 @@ async def delete(post_id: str, user_id: str) -> PostDeleteResponse:
 
 @router.get("/feed", response_model=PostFeedResponse)
 async def get_feed(limit: int = 50, offset: int = 0, language: str = "en") -> PostFeedResponse:
-    posts = await get_all_posts(limit, offset)
-
-    for post in posts:
-        post.content_desc = bot.translate_content(post.content_desc, language)
+    posts = [localize_post(post, language) for post in await get_all_posts(limit, offset)]
     return PostFeedResponse(posts=posts, count=len(posts))
 
 @router.post("/like", response_model=PostActionResponse)
@@ -17,5 +17,47 @@ class Settings(BaseSettings):
     firebase_credentials_path: str = Field("firebase-creds.json")
     celery_broker_url: str = Field("redis://localhost:6379/0")
     deepgram_api_key: str = Field(...)
+    # chat histories longer than this are summarised down to the last `chat_compaction_keep` turns
+    chat_compaction_threshold: int = Field(40)
+    chat_compaction_keep: int = Field(10)
+    # recent messages fetched for a chat turn, packed newest-first into the token budget
+    chat_context_messages: int = Field(30)
+    chat_context_token_budget: int = Field(2000)
+    chat_message_token_limit: int = Field(500)
+    llm_cache_ttl: int = Field(7 * 24 * 3600)
+    llm_cache_max_entries: int = Field(50000)
+    tts_voice: str = Field("Kore")
+    # "opus", "mp3" or "wav"; compression_level is libsndfile's 0 (best quality) to 1 (smallest)
+    tts_audio_format: str = Field("opus")
+    tts_compression_level: float = Field(0.7)
+    # streaming TTS synthesizes this many sentences at once, fragments shorter than min_chars are merged
+    tts_stream_concurrency: int = Field(3)
+    tts_sentence_min_chars: int = Field(40)
+    # /chat/realtime: silence (ms) that ends a phrase, and the fallback word-gap that ends an utterance
+    realtime_endpointing_ms: int = Field(300)
+    realtime_utterance_end_ms: int = Field(1000)
+    # seconds between keepalives to the transcription stream while a reply is produced
+    realtime_keepalive_seconds: float = Field(5)
+    # synthesized audio is kept in storage and indexed by (text, voice, language) for this long
+    tts_cache_ttl: int = Field(30 * 24 * 3600)
+    weather_fetch_concurrency: int = Field(8)
+    # forecasts are served from cache for `fresh` seconds, then served stale while refreshing until `max`
+    weather_cache_fresh_ttl: int = Field(15 * 60)
+    weather_cache_max_ttl: int = Field(3 * 3600)
+    alert_localize_concurrency: int = Field(16)
+    # devices subscribed before alerts were split per language are on the bare location topic,
+    # they keep receiving alerts in this language (empty to stop sending to the bare topics)
+    alert_legacy_topic_language: str = Field("en")
+    market_api_timeout: float = Field(15.0)
+    # written by the Celery worker and read by the API, both must see the same file
+    mandi_db_path: str = Field("/var/lib/krishi/mandi.sqlite3")
+    mandi_sync_page_size: int = Field(1000)
+    # diagnosis uploads are downscaled to this size and re-encoded before inference, analysis and storage
+    image_max_side: int = Field(1024)
+    image_format: str = Field("JPEG")
+    image_quality: int = Field(85)
+    # near-duplicate photos (perceptual hashes within this many bits) reuse an earlier diagnosis
+    diagnosis_cache_ttl: int = Field(3 * 24 * 3600)
+    diagnosis_cache_max_distance: int = Field(5)
 
 settings = Settings()
\ No newline at end of file
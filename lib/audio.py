@@ -0,0 +1,92 @@
+import io
+import re
+import wave
+from dataclasses import dataclass
+
+import numpy as np
+
+from config.settings import settings
+
+try:
+    import soundfile
+except ImportError:  # libsndfile isn't available everywhere, those hosts serve WAV
+    soundfile = None
+
+# Gemini TTS returns 24 kHz mono 16-bit PCM
+SAMPLE_RATE = 24000
+
+# name -> (libsndfile format, subtype, content type, file extension)
+AUDIO_FORMATS = {
+    "opus": ("OGG", "OPUS", "audio/ogg", ".ogg"),
+    "mp3": ("MP3", "MPEG_LAYER_III", "audio/mpeg", ".mp3"),
+    "wav": ("WAV", "PCM_16", "audio/x-wav", ".wav"),
+}
+
+# sentence ends (including the danda used by Hindi and Marathi) and line breaks
+SENTENCE_BREAK = re.compile(r"(?<=[.!?।॥])\s+|\n+")
+
+@dataclass
+class EncodedAudio:
+    data: bytes
+    format: str
+    content_type: str
+    extension: str
+
+def wav_bytes(pcm: bytes, rate: int = SAMPLE_RATE, channels: int = 1, sample_width: int = 2) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+    return buffer.getvalue()
+
+def encode_pcm(
+    pcm: bytes,
+    audio_format: str = settings.tts_audio_format,
+    rate: int = SAMPLE_RATE,
+    compression_level: float = settings.tts_compression_level,
+) -> EncodedAudio:
+    """Encode 16-bit mono PCM in memory.
+
+    Compressed formats need soundfile (libsndfile >= 1.1 for mp3); unknown
+    formats, a missing codec or an encoder error fall back to WAV.
+    CPU bound, call it from a worker thread.
+    """
+    audio_format = (audio_format or "wav").lower()
+    if audio_format != "wav" and audio_format in AUDIO_FORMATS and soundfile is not None:
+        container, subtype, content_type, extension = AUDIO_FORMATS[audio_format]
+        try:
+            buffer = io.BytesIO()
+            soundfile.write(
+                buffer,
+                np.frombuffer(pcm, dtype="<i2"),
+                rate,
+                format=container,
+                subtype=subtype,
+                compression_level=compression_level,
+            )
+            return EncodedAudio(buffer.getvalue(), audio_format, content_type, extension)
+        except Exception as e:
+            print(f"Error encoding {audio_format} audio, falling back to wav: {e}")
+
+    _, _, content_type, extension = AUDIO_FORMATS["wav"]
+    return EncodedAudio(wav_bytes(pcm, rate), "wav", content_type, extension)
+
+def split_sentences(text: str, min_chars: int = settings.tts_sentence_min_chars) -> list[str]:
+    """Split a reply into sentences for pipelined synthesis, merging short fragments into the next one"""
+    sentences, pending = [], ""
+    for part in SENTENCE_BREAK.split(text):
+        part = part.strip()
+        if not part:
+            continue
+        pending = f"{pending} {part}" if pending else part
+        if len(pending) >= min_chars:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
@@ -0,0 +1,122 @@
+import re
+import time
+import hashlib
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from config.settings import settings
+from lib.metrics import incr
+from lib.redis import async_pool
+
+class ResponseCache:
+    """Interface for caching LLM responses, see `RedisResponseCache`"""
+    async def get(self, namespace: str, model: str, prompt: str, language: str = "") -> Optional[str]:
+        return None
+
+    async def set(self, namespace: str, model: str, prompt: str, response: str, language: str = "") -> None:
+        return None
+
+    async def stats(self) -> dict:
+        return {}
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so prompts differing only in layout share a cache entry.
+
+    Case is kept: "Partly Cloudy" and "Partly cloudy" must come back as
+    themselves, translation replies are keyed by the exact input text.
+    """
+    return re.sub(r"\s+", " ", prompt).strip()
+
+def cache_key(namespace: str, model: str, prompt: str, language: str = "") -> str:
+    digest = hashlib.sha256(f"{model}\x00{language}\x00{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+    return f"llm_cache:{namespace}:{digest}"
+
+class RedisResponseCache(ResponseCache):
+    """LLM response cache in Redis.
+
+    Entries expire after `ttl` seconds. The cache is also bounded to
+    `max_entries`: every key is tracked in a sorted set by insertion time
+    and the oldest ones are evicted once it grows past the limit.
+    Hit/miss counters are kept per namespace in the `llm_cache:stats` hash.
+
+    Redis errors are treated as a miss so a cache outage never fails the
+    underlying LLM call.
+    """
+    index_key = "llm_cache:index"
+    stats_key = "llm_cache:stats"
+
+    def __init__(self, ttl: int = settings.llm_cache_ttl, max_entries: int = settings.llm_cache_max_entries):
+        self.client = aioredis.Redis(connection_pool=async_pool)
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    async def get(self, namespace: str, model: str, prompt: str, language: str = "") -> Optional[str]:
+        try:
+            response = await self.client.get(cache_key(namespace, model, prompt, language))
+            counter = "misses" if response is None else "hits"
+            await self.client.hincrby(self.stats_key, f"{namespace}:{counter}", 1)
+            return response
+        except Exception as e:
+            print(f"Cache error: {e}")
+            return None
+
+    async def set(self, namespace: str, model: str, prompt: str, response: str, language: str = "") -> None:
+        if not response:
+            return
+        try:
+            key = cache_key(namespace, model, prompt, language)
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.set(key, response, ex=self.ttl)
+                pipe.zadd(self.index_key, {key: time.time()})
+                # entries older than the TTL have already expired, drop them from the index
+                pipe.zremrangebyscore(self.index_key, "-inf", time.time() - self.ttl)
+                pipe.zcard(self.index_key)
+                *_, size = await pipe.execute()
+
+            if size > self.max_entries:
+                evicted = await self.client.zpopmin(self.index_key, size - self.max_entries)
+                if evicted:
+                    await self.client.delete(*[k for k, _ in evicted])
+                    await self.client.hincrby(self.stats_key, "evictions", len(evicted))
+        except Exception as e:
+            print(f"Cache error: {e}")
+
+    async def stats(self) -> dict:
+        return {k: int(v) for k, v in (await self.client.hgetall(self.stats_key)).items()}
+
+def audio_digest(text: str, voice: str, language: str, audio_format: str = "") -> str:
+    """Content address of a synthesized clip, whitespace differences don't change the audio"""
+    text = re.sub(r"\s+", " ", text).strip()
+    return hashlib.sha256(f"{voice}\x00{language}\x00{audio_format}\x00{text}".encode("utf-8")).hexdigest()
+
+class AudioCache:
+    """Index of synthesized speech already in storage, keyed by `audio_digest`.
+
+    Only the storage path and content type are kept in Redis (`tts_cache:{digest}`), callers
+    sign a fresh URL for it on every hit. Hits and misses are counted under
+    metrics:counter:tts_cache:*.
+    """
+    def __init__(self, ttl: int = settings.tts_cache_ttl):
+        self.client = aioredis.Redis(connection_pool=async_pool)
+        self.ttl = ttl
+
+    async def get(self, digest: str) -> Optional[dict]:
+        """{"path", "content_type"} of the stored clip, or None"""
+        try:
+            entry = await self.client.hgetall(f"tts_cache:{digest}")
+        except Exception as e:
+            print(f"Cache error: {e}")
+            entry = None
+        await incr("tts_cache:hits" if entry else "tts_cache:misses")
+        return entry or None
+
+    async def set(self, digest: str, path: str, content_type: str) -> None:
+        try:
+            key = f"tts_cache:{digest}"
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping={"path": path, "content_type": content_type})
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Cache error: {e}")
@@ -1,66 +1,255 @@
-import httpx
+import os
+import time
+import asyncio
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_ready
 from firebase_admin import messaging
 
 from agent.bot import Bot
 from config.settings import settings
-from lib.db import get_all_locations
+from lib.db import (
+    get_all_locations,
+    get_all_languages,
+    get_post,
+    parse_post_description,
+    add_post_translations
+)
+from lib.redis import Redis, MIGRATION_DONE_KEY
+from lib.mandi import sync_mandi_prices as _sync_mandi_prices
+from lib.firebase import alert_topic, send_messages
+from lib.localization import normalize_language
+from lib.weather import forecast_cache, fetch_alerts, alert_content_key, alert_fingerprints
 
 # Initialize Celery
 app = Celery('krishi', broker=settings.celery_broker_url)
 bot = Bot()
+redis_client = Redis()
+
+# One event loop per worker process. Bot methods use the shared async Redis pool
+# (response cache), whose connections are bound to the loop that opened them, so
+# a fresh asyncio.run() loop per task would break them. The loop is created lazily
+# in each child: one created at import time would be inherited across the prefork
+# fork, and the children would then share its selector and wakeup pipe.
+_loop = None
+_loop_pid = None
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _loop_pid
+    if _loop is None or _loop_pid != os.getpid():
+        _loop = asyncio.new_event_loop()
+        _loop_pid = os.getpid()
+    return _loop
+
+def run_async(coro):
+    return get_loop().run_until_complete(coro)
 
 # Configure periodic tasks
 app.conf.beat_schedule = {
     'check-weather-alerts': {
-        'task': 'tasks.check_weather_alerts',
-        'schedule': crontab(hour=6, minute=0),  # Run at 6 AM every day
+        'task': 'lib.celery.check_weather_alerts',
+        'schedule': crontab(minute=0),  # Run every hour, already-sent alerts are skipped
+    },
+    'prewarm-weather-forecasts': {
+        'task': 'lib.celery.prewarm_weather_forecasts',
+        'schedule': crontab(minute='*/10'),
+    },
+    'sync-mandi-prices': {
+        'task': 'lib.celery.sync_mandi_prices',
+        'schedule': crontab(minute=30, hour='*/3'),  # mandis report through the day
     },
 }
 
+# Caps concurrent Gemini calls while localizing alerts
+localize_semaphore = asyncio.Semaphore(settings.alert_localize_concurrency)
+
+async def _localize_alert(alert: dict, language: str) -> str:
+    try:
+        async with localize_semaphore:
+            return await bot.create_notification_message(alert, language)
+    except Exception as e:
+        print(f"Error localizing alert: {e}")
+        return alert.get('headline')
+
+async def _check_weather_alerts():
+    started = time.perf_counter()
+    locations = await get_all_locations()
+    if not locations:
+        return "No weather checks"
+    languages = await get_all_languages() or ["en"]
+    legacy_language = normalize_language(settings.alert_legacy_topic_language) if settings.alert_legacy_topic_language else ""
+
+    # Fetches are bounded by the shared weatherapi semaphore in lib.weather
+    results = await asyncio.gather(
+        *[fetch_alerts(location.district, location.state) for location in locations]
+    )
+    fetched = time.perf_counter()
+
+    # Every FCM topic an alert goes to: the per-language topics, plus the bare location
+    # topic that devices subscribed before the per-language topics still listen on
+    fetched_alerts = {}
+    for location, alerts in zip(locations, results):
+        for alert in alerts or []:
+            fetched_alerts[(location.firebase_topic, alert_content_key(alert))] = alert
+    targets = []
+    for (topic, key), alert in fetched_alerts.items():
+        targets += [(alert_topic(topic, language), language, key, alert) for language in languages]
+        if legacy_language:
+            targets.append((topic, legacy_language, key, alert))
+
+    # Drop targets already sent, weatherapi repeats alerts until they expire. Fingerprints are per
+    # target topic, so a variant whose send failed is retried on the next run.
+    unsent = await alert_fingerprints.unsent([(target_topic, alert) for target_topic, _, _, alert in targets])
+    unsent_ids = {(target_topic, alert_content_key(alert)) for target_topic, alert in unsent}
+    pending = [target for target in targets if (target[0], target[2]) in unsent_ids]
+
+    # The same alert is usually issued for many districts, localize each one once per language
+    unique_alerts = {key: alert for _, _, key, alert in pending}
+    localization_keys = list(dict.fromkeys((key, language) for _, language, key, _ in pending))
+    localized = dict(zip(localization_keys, await asyncio.gather(
+        *[_localize_alert(unique_alerts[key], language) for key, language in localization_keys]
+    )))
+    localized_at = time.perf_counter()
+
+    messages = [
+        messaging.Message(
+            notification=messaging.Notification(
+                title="Krishi Weather Alert",
+                body=localized[(key, language)],
+            ),
+            topic=target_topic,
+        )
+        for target_topic, language, key, _ in pending
+    ]
+    # firebase-admin is synchronous, keep it off the event loop
+    results_sent = await asyncio.to_thread(send_messages, messages)
+
+    # Only the targets that actually went out are recorded
+    await alert_fingerprints.mark_sent([
+        (target_topic, alert) for (target_topic, _, _, alert), sent in zip(pending, results_sent) if sent
+    ])
+
+    stats = {
+        "locations": len(locations),
+        "failed_fetches": sum(1 for alerts in results if alerts is None),
+        "alerts": len(fetched_alerts),
+        "new_targets": len(pending),
+        "unique_alerts": len(unique_alerts),
+        "localizations": len(localization_keys),
+        "sent": sum(results_sent),
+        "failed_sends": len(results_sent) - sum(results_sent),
+        "fetch_s": round(fetched - started, 2),
+        "localize_s": round(localized_at - fetched, 2),
+        "send_s": round(time.perf_counter() - localized_at, 2),
+        "duration_s": round(time.perf_counter() - started, 2),
+    }
+    print(f"Weather alerts check completed: {stats}")
+    return stats
+
 @app.task
 def check_weather_alerts():
-    """Fetch weather alerts and send notifications"""
-    
+    """Fetch weather alerts for every location, localize them and send notifications in batches"""
     try:
-        # Get all unique locations
-        locations = get_all_locations()
-        if not locations:
-            return "No weather checks"
-
-        for location in locations:
-            # Fetch weather data
-            weather_url = f"http://api.weatherapi.com/v1/alerts.json?key={settings.weather_api_key}&q={location.district},{location.state}"
-            
-            with httpx.Client() as client:
-                response = client.get(weather_url)
-                
-                if response.status_code == 200:
-                    weather_data = response.json()
-                    
-                    alert_data = weather_data['alerts']['alert']
-
-                    # Send notification if there's an alert
-                    if alert_data:
-                        # TODO: translate acc to preference
-                        # alert_message = bot.create_notification_message(alert_data)
-                        message = messaging.Message(
-                            notification=messaging.Notification(
-                                title="Krishi Weather Alert",
-                                body=alert_data.get('headline'),
-                            ),
-                            topic=location.firebase_topic,
-                        )
-                        
-                        try:
-                            messaging.send(message)
-                            print(f"Alert sent to topic {location.firebase_topic}")
-                        except Exception as e:
-                            print(f"Error sending notification: {e}")
-        return "Weather alerts check completed"
+        return run_async(_check_weather_alerts())
+    except Exception as e:
+        print(f"Exception ocurred {e}")
+
+@app.task
+def compact_chat_history(user_id: str):
+    """Fold a user's older chat turns into their rolling summary, keeping the latest few raw"""
+    try:
+        history_length = redis_client.history_length(user_id)
+        count = history_length - settings.chat_compaction_keep
+        if count <= 0:
+            return "Nothing to compact"
+
+        messages = redis_client.get_oldest_messages(user_id, count)
+        summary = run_async(bot.summarize_history(messages, redis_client.get_summary(user_id)))
+        if not redis_client.compact_history(user_id, summary, messages):
+            return "History changed during compaction, skipped"
+        return f"Compacted {len(messages)} messages"
+    except Exception as e:
+        print(f"Exception ocurred {e}")
+    finally:
+        redis_client.release_compaction(user_id)
+
+@app.task
+def migrate_chat_histories():
+    """One-time conversion of legacy JSON chat blobs to Redis lists, a no-op once it has completed"""
+    try:
+        if redis_client.client.exists(MIGRATION_DONE_KEY):
+            return "Chat histories already migrated"
+        return f"Migrated {redis_client.migrate_chat_histories()} chat histories"
+    except Exception as e:
+        print(f"Exception ocurred {e}")
+
+@worker_ready.connect
+def on_worker_ready(**kwargs):
+    migrate_chat_histories.delay()
+
+async def _prewarm_weather_forecasts():
+    locations = await get_all_locations()
+    if not locations:
+        return "No locations to prewarm"
+    unique = list(dict.fromkeys((location.district, location.state) for location in locations))
+    forecasts = await asyncio.gather(
+        *[forecast_cache.refresh(district, state) for district, state in unique]
+    )
+    return f"Prewarmed {sum(1 for f in forecasts if f)}/{len(unique)} locations"
+
+@app.task
+def prewarm_weather_forecasts():
+    """Refresh the cached forecast of every known location so /weather/get reads hit the cache"""
+    try:
+        return run_async(_prewarm_weather_forecasts())
+    except Exception as e:
+        print(f"Exception ocurred {e}")
+
+@app.task
+def sync_mandi_prices():
+    """Pull new arrival dates of the OGD mandi price resource into the local mirror"""
+    try:
+        return run_async(_sync_mandi_prices())
+    except Exception as e:
+        print(f"Exception ocurred {e}")
+
+async def _translate_post(post_id: str):
+    post = await get_post(post_id)
+    if not post:
+        return "Post not found"
+    desc = parse_post_description(post.content_desc)
+    # farmers' languages are stored as codes or names, translations are keyed by code
+    languages = [
+        language for language in dict.fromkeys(normalize_language(l) for l in (await get_all_languages() or []) if l)
+        if language != desc["language"] and language not in desc["translations"]
+    ]
+    if not languages:
+        return "No translations needed"
+
+    results = await asyncio.gather(
+        *[bot.translate_content_strict(desc["original"], language) for language in languages],
+        return_exceptions=True
+    )
+    # Only real translations are stored, languages that failed are left for the retry
+    translations = {
+        language: result for language, result in zip(languages, results)
+        if not isinstance(result, BaseException)
+    }
+    if translations:
+        await add_post_translations(post_id, translations)
+    failed = [language for language, result in zip(languages, results) if isinstance(result, BaseException)]
+    if failed:
+        raise RuntimeError(f"Translation failed for {failed}: {next(r for r in results if isinstance(r, BaseException))}")
+    return f"Translated post into {len(languages)} languages"
+
+@app.task(bind=True, max_retries=5, default_retry_delay=120)
+def translate_post(self, post_id: str):
+    """Translate a new post into every farmer language and store the results on the post"""
+    try:
+        return run_async(_translate_post(post_id))
     except Exception as e:
         print(f"Exception ocurred {e}")
+        raise self.retry(exc=e)
 
 # # For testing - send immediate alert
 # @app.task
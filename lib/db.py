@@ -1,16 +1,21 @@
 import json
+import asyncio
 import numpy as np
 from uuid import uuid4
 from datetime import datetime
 from supabase import AsyncClient, create_async_client
 
 from config.settings import settings
-from lib.firebase import subscribe_to_topic
+from lib.firebase import subscribe_to_topic, unsubscribe_from_topic, alert_topic
+from lib.redis import AsyncRedis
+from lib.localization import normalize_language
 from lib.models import Location, Farmer, Crop, Farm, Post, Comment, Message
 
 global supabase 
 supabase = None
 
+redis_client = AsyncRedis()
+
 async def initialize_supabase():
     """Initialize the Supabase client asynchronously."""
     global supabase
@@ -63,6 +68,7 @@ async def update_farmer(
     district: str,
 ):
     supabase = await get_supabase_client()
+    previous = await get_farmer(farmer_id) if language else None
     update_data = {}
     if name:
         update_data["name"] = name
@@ -77,7 +83,17 @@ async def update_farmer(
     farmer = await supabase.table("farmers").update(update_data).eq("farmer_id", farmer_id).execute()
     if not farmer.data:
         return
-    return Farmer(**farmer.data[0])
+    farmer = Farmer(**farmer.data[0])
+    if previous and normalize_language(previous.language or "") != normalize_language(farmer.language):
+        await move_alert_subscriptions(farmer_id, previous.language, farmer.language)
+    return farmer
+
+async def move_alert_subscriptions(farmer_id: str, old_language: str, new_language: str):
+    """Re-subscribe a farmer's devices from the old language's alert topics to the new one's"""
+    for topic, token in await redis_client.get_alert_subscriptions(farmer_id):
+        if old_language:
+            await asyncio.to_thread(unsubscribe_from_topic, alert_topic(topic, normalize_language(old_language)), [token])
+        await asyncio.to_thread(subscribe_to_topic, alert_topic(topic, normalize_language(new_language)), [token])
 
 async def get_farmer(user_id: str):
     supabase = await get_supabase_client()
@@ -90,16 +106,28 @@ async def get_farmer(user_id: str):
 
 async def get_all_languages():
     supabase = await get_supabase_client()
-    languages = await (
-        supabase
-        .table("farmers")
-        .select("language")
-        .distinct()
-        .execute()
-    )
-    if not languages.data:
+    # postgrest has no DISTINCT and caps each response (1000 rows by default),
+    # so page until a page comes back empty and dedupe here
+    page_size = 1000
+    languages, offset = {}, 0
+    while True:
+        page = await (
+            supabase
+            .table("farmers")
+            .select("language")
+            .range(offset, offset + page_size - 1)
+            .execute()
+        )
+        if not page.data:
+            break
+        for row in page.data:
+            # stored as either a code or a name, skip farmers without one
+            if row.get("language"):
+                languages.setdefault(normalize_language(row["language"]), None)
+        offset += len(page.data)
+    if not languages:
         return
-    return [language["language"] for language in languages.data]
+    return list(languages)
 
 ##### FARM OPERATIONS #####
 
@@ -129,9 +157,15 @@ async def create_farm(
         topic = f"weather_alerts_{district}_{state}"
         print(f"Creating location {district}, {state}, {topic}")
         await create_location(district, state, topic)
-        # subscribe to topic
-        print(f"Subscribing to topic {topic}")
-        subscribe_to_topic(topic, [fcm_key])
+    else:
+        topic = location.data[0]["firebase_topic"]
+
+    # alerts are localized per language, subscribe to the topic for the farmer's language
+    farmer = await get_farmer(farmer_id)
+    language = normalize_language(farmer.language) if farmer and farmer.language else "en"
+    print(f"Subscribing to topic {alert_topic(topic, language)}")
+    await asyncio.to_thread(subscribe_to_topic, alert_topic(topic, language), [fcm_key])
+    await redis_client.add_alert_subscription(farmer_id, topic, fcm_key)
     return Farm(**farm.data[0])
 
 async def get_farms(farmer_id: str):
@@ -205,17 +239,47 @@ async def get_crops(farmer_id: str):
 
 ##### POST OPERATIONS #####
 
+def parse_post_description(content_desc: str) -> dict:
+    """Decode a post's content_desc into {"original", "language", "translations"}.
+
+    Older posts stored the description as plain text, those come back with no translations.
+    Languages are normalized to codes, farmers' languages are stored as either ("hi" or "hindi").
+    """
+    try:
+        desc = json.loads(content_desc)
+    except (TypeError, json.JSONDecodeError):
+        desc = None
+    if not isinstance(desc, dict) or "original" not in desc:
+        return {"original": content_desc, "language": None, "translations": {}}
+    if desc.get("language"):
+        desc["language"] = normalize_language(desc["language"])
+    desc["translations"] = {
+        normalize_language(language): text for language, text in (desc.get("translations") or {}).items()
+    }
+    return desc
+
+def localize_post(post: Post, language: str) -> Post:
+    """Return the post with content_desc replaced by its stored translation for `language`"""
+    desc = parse_post_description(post.content_desc)
+    language = normalize_language(language)
+    text = desc["original"] if language == desc["language"] else desc["translations"].get(language, desc["original"])
+    return post.model_copy(update={"content_desc": text})
+
 async def create_post(
     user_id: str,
     content_url: str,
     content_desc: str,
+    language: str = None,
 ):
     supabase = await get_supabase_client()
     post = await supabase.table("posts").insert({
         "id": str(uuid4()),
         "user_id": user_id,
         "content_url": content_url,
-        "content_desc": content_desc,
+        "content_desc": json.dumps(
+            {"original": content_desc, "language": normalize_language(language) if language else None, "translations": {}},
+            ensure_ascii=False,
+        ),
         "likes": 0,
         "reports": 0,
         "comment_ids": [],
@@ -235,6 +299,13 @@ async def delete_post(post_id: str, user_id: str):
     result = await supabase.table("posts").delete().eq("id", post_id).execute()
     return True if result.data else False
 
+async def get_post(post_id: str):
+    supabase = await get_supabase_client()
+    post = await supabase.table("posts").select("*").eq("id", post_id).execute()
+    if not post.data:
+        return
+    return Post(**post.data[0])
+
 async def get_all_posts(limit: int = 50, offset: int = 0):
     supabase = await get_supabase_client()
     posts = await supabase.table("posts").select("*").order("created_at", desc=True).limit(limit).offset(offset).execute()
@@ -267,14 +338,20 @@ async def dislike_post(post_id: str):
     return True if result.data else False
 
 async def add_post_translation(post_id: str, language: str, translation: str):
+    return await add_post_translations(post_id, {language: translation})
+
+async def add_post_translations(post_id: str, translations: dict[str, str]):
+    """Merge translations ({language: text}) into the post's content_desc in a single update"""
     supabase = await get_supabase_client()
     post = await supabase.table("posts").select("content_desc").eq("id", post_id).execute()
     if not post.data:
         return False  # Post not found
     
-    content_desc = json.loads(post.data[0]["content_desc"])
-    content_desc["translations"][language] = translation
-    await supabase.table("posts").update({"content_desc": json.dumps(content_desc)}).eq("id", post_id).execute()
+    content_desc = parse_post_description(post.data[0]["content_desc"])
+    content_desc["translations"].update(
+        {normalize_language(language): text for language, text in translations.items()}
+    )
+    await supabase.table("posts").update({"content_desc": json.dumps(content_desc, ensure_ascii=False)}).eq("id", post_id).execute()
     return True
 
 ##### COMMENT OPERATIONS #####
@@ -365,26 +442,33 @@ async def get_comments_for_post(post_id: str, limit: int = 50, offset: int = 0):
 
 ##### STORAGE OPERATIONS #####
 
-async def save_to_supabase(file_path: str, file_id: str, content_type: str) -> str:
+async def save_to_supabase(file_path: str | bytes, file_id: str, content_type: str, upsert: bool = False) -> str:
     """Save file to supabase
     
     Args:
-        file_path (str): path to the file
+        file_path (str | bytes): path to the file, or the file contents already in memory
         file_id (str): unique identifier for the file in supabase
         content_type (str): content type of the file (e.g., "audio/x-wav" or "image/jpeg") defaults to "text/html"
+        upsert (bool): overwrite an existing object at `file_id`
     """
     supabase = await get_supabase_client()
+    file_options = {"cache-control": "3600", "upsert": str(upsert).lower(), "content-type": content_type}
 
-    with open(file_path, "rb") as f:
-        response = (
-            await supabase.storage
-            .from_("krishi")
-            .upload(
-                file=f,
-                path=file_id,
-                file_options={"cache-control": "3600", "upsert": "false", "content-type": content_type},
-            )
+    if isinstance(file_path, bytes):
+        response = await supabase.storage.from_("krishi").upload(
+            file=file_path, path=file_id, file_options=file_options
         )
+    else:
+        with open(file_path, "rb") as f:
+            response = (
+                await supabase.storage
+                .from_("krishi")
+                .upload(
+                    file=f,
+                    path=file_id,
+                    file_options=file_options,
+                )
+            )
     if not response:
         return
     return True
@@ -11,4 +11,28 @@ def subscribe_to_topic(topic: str, tokens: list[str]):
         response = messaging.subscribe_to_topic(tokens, topic)
         print(f"Successfully subscribed to topic: {response.success_count} succeeded, {response.failure_count} failed")
     except Exception as e:
-        print(f"Error subscribing to topic: {e}")
\ No newline at end of file
+        print(f"Error subscribing to topic: {e}")
+
+def unsubscribe_from_topic(topic: str, tokens: list[str]):
+    try:
+        response = messaging.unsubscribe_from_topic(tokens, topic)
+        print(f"Successfully unsubscribed from topic: {response.success_count} succeeded, {response.failure_count} failed")
+    except Exception as e:
+        print(f"Error unsubscribing from topic: {e}")
+
+def alert_topic(base_topic: str, language: str) -> str:
+    """Per-language variant of a location's alert topic"""
+    return f"{base_topic}_{language}"
+
+def send_messages(messages: list[messaging.Message], batch_size: int = 500) -> list[bool]:
+    """Send messages with FCM's batch API (up to 500 per call), returns whether each one was sent"""
+    sent = []
+    for i in range(0, len(messages), batch_size):
+        batch = messages[i:i + batch_size]
+        try:
+            response = messaging.send_each(batch)
+            sent.extend(r.success for r in response.responses)
+        except Exception as e:
+            print(f"Error sending notification batch: {e}")
+            sent.extend([False] * len(batch))
+    return sent
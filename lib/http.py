@@ -0,0 +1,49 @@
+import time
+import random
+import asyncio
+import httpx
+
+from lib.metrics import record_latency
+
+# Shared async HTTP client so upstream calls reuse pooled keep-alive connections
+# instead of paying a new TCP/TLS handshake per request.
+http_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(10.0, connect=5.0),
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+)
+
+async def close_http_client():
+    await http_client.aclose()
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+async def get_with_retry(
+    url: str,
+    params: dict = None,
+    metric: str = None,
+    retries: int = 3,
+    backoff: float = 0.5,
+    timeout: float = None,
+) -> httpx.Response:
+    """GET through the shared client, retrying transport errors, 429s and 5xx with exponential backoff.
+
+    Each attempt's latency is recorded under `metric` if given. Returns the last
+    response, or raises the last transport error once retries are exhausted.
+    """
+    for attempt in range(retries + 1):
+        started = time.perf_counter()
+        try:
+            kwargs = {"params": params}
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            response = await http_client.get(url, **kwargs)
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                return response
+        finally:
+            if metric:
+                await record_latency(metric, time.perf_counter() - started)
+        await asyncio.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
@@ -0,0 +1,162 @@
+import io
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import redis.asyncio as aioredis
+from PIL import Image, ImageOps
+
+from config.settings import settings
+from lib.metrics import incr
+from lib.redis import async_pool
+
+CONTENT_TYPES = {"JPEG": ("image/jpeg", ".jpg"), "WEBP": ("image/webp", ".webp")}
+
+@dataclass
+class ProcessedImage:
+    """A decoded, upright, downscaled upload and its compact re-encoding"""
+    image: Image.Image
+    data: bytes
+    content_type: str
+    extension: str
+    phash: int
+
+def perceptual_hash(image: Image.Image) -> int:
+    """64-bit difference hash: one bit per horizontally adjacent pixel pair of a 9x8 grayscale thumbnail.
+
+    Re-encoding, resizing and small exposure changes flip only a few bits,
+    so near-duplicate photos end up a small Hamming distance apart.
+    """
+    pixels = image.convert("L").resize((9, 8), Image.Resampling.LANCZOS).tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+def preprocess_image(
+    data: bytes,
+    max_side: int = settings.image_max_side,
+    image_format: str = settings.image_format,
+    quality: int = settings.image_quality,
+) -> ProcessedImage:
+    """Decode an uploaded photo once, fix its EXIF orientation, shrink it to `max_side` and re-encode it.
+
+    Raises ValueError if the bytes aren't an image. CPU bound, call it from a worker thread.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception as e:
+        raise ValueError(f"Could not decode image: {e}")
+
+    # Phones store rotation in EXIF instead of rotating the pixels
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+    image_format = image_format.upper()
+    content_type, extension = CONTENT_TYPES[image_format]
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality, optimize=True)
+    return ProcessedImage(
+        image=image,
+        data=buffer.getvalue(),
+        content_type=content_type,
+        extension=extension,
+        phash=perceptual_hash(image),
+    )
+
+@dataclass
+class CachedDiagnosis:
+    phash: int
+    distance: int
+    result: Any
+    analysis: Optional[str]
+
+class DiagnosisCache:
+    """Redis index of recent diagnoses keyed by perceptual hash.
+
+    Each entry (`diagnosis:{phash}`) holds the Roboflow workflow output and
+    the analysis text per language. To find near duplicates without a scan,
+    the 64-bit hash is split into 8 one-byte bands and every entry is listed
+    in a set per band; by pigeonhole any hash within 7 bits of an entry
+    shares at least one band with it, so `max_distance` up to 7 is exact.
+    Band sets are sorted sets scored by insert time, so members older than
+    the entry TTL are trimmed on write and ignored on read.
+    """
+    bands = 8
+
+    def __init__(self, ttl: int = settings.diagnosis_cache_ttl, max_distance: int = settings.diagnosis_cache_max_distance):
+        self.client = aioredis.Redis(connection_pool=async_pool)
+        self.ttl = ttl
+        self.max_distance = max_distance
+
+    def entry_key(self, phash: int) -> str:
+        return f"diagnosis:{phash:016x}"
+
+    def band_keys(self, phash: int) -> list[str]:
+        return [f"diagnosis:bands:{i}:{(phash >> (8 * i)) & 0xff:02x}" for i in range(self.bands)]
+
+    async def _lookup(self, phash: int, language: str) -> Optional[CachedDiagnosis]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key in self.band_keys(phash):
+                pipe.zrangebyscore(key, time.time() - self.ttl, "+inf")
+            members = set().union(*await pipe.execute())
+
+        candidates = sorted(
+            (bin(phash ^ candidate).count("1"), candidate)
+            for candidate in (int(member, 16) for member in members)
+        )
+        for distance, candidate in candidates:
+            if distance > self.max_distance:
+                break
+            result, analysis = await self.client.hmget(self.entry_key(candidate), "result", f"analysis:{language}")
+            if result is not None:
+                return CachedDiagnosis(candidate, distance, json.loads(result), analysis)
+            # the entry expired (or was evicted) before its band members aged out
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key in self.band_keys(candidate):
+                    pipe.zrem(key, f"{candidate:016x}")
+                await pipe.execute()
+        return None
+
+    async def get(self, phash: int, language: str) -> Optional[CachedDiagnosis]:
+        """Closest cached diagnosis within `max_distance`, with its analysis in `language` if there is one"""
+        try:
+            cached = await self._lookup(phash, language)
+        except Exception as e:
+            print(f"Diagnosis cache error: {e}")
+            cached = None
+
+        if cached is None:
+            await incr("diagnosis_cache:misses")
+        elif cached.analysis is None:
+            # same photo, different language: only the analysis has to be redone
+            await incr("diagnosis_cache:result_hits")
+        else:
+            await incr("diagnosis_cache:hits")
+        return cached
+
+    async def set(self, phash: int, language: str, result: Any, analysis: str) -> None:
+        """Store (or add a language to) the entry for `phash`"""
+        if not analysis:
+            return
+        try:
+            key = self.entry_key(phash)
+            now = time.time()
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping={"result": json.dumps(result, default=str), f"analysis:{language}": analysis})
+                pipe.expire(key, self.ttl)
+                for band_key in self.band_keys(phash):
+                    pipe.zadd(band_key, {f"{phash:016x}": now})
+                    pipe.zremrangebyscore(band_key, "-inf", now - self.ttl)
+                    pipe.expire(band_key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Diagnosis cache error: {e}")
+
+diagnosis_cache = DiagnosisCache()
@@ -0,0 +1,216 @@
+from typing import Dict, Any
+
+# Farmers' language preference is stored either as a code or as a name
+LANGUAGE_ALIASES = {
+    "english": "en",
+    "hindi": "hi",
+    "marathi": "mr",
+    "bengali": "bn",
+    "gujarati": "gu",
+    "punjabi": "pa",
+    "odia": "or",
+    "tamil": "ta",
+    "telugu": "te",
+    "kannada": "kn",
+    "malayalam": "ml",
+}
+
+# Native digit scripts, languages not listed keep 0-9
+DIGITS = {
+    "hi": "०१२३४५६७८९",
+    "mr": "०१२३४५६७८९",
+    "bn": "০১২৩৪৫৬৭৮৯",
+    "gu": "૦૧૨૩૪૫૬૭૮૯",
+    "pa": "੦੧੨੩੪੫੬੭੮੯",
+    "or": "୦୧୨୩୪୫୬୭୮୯",
+}
+
+# English labels for the fields served by /weather/get
+WEATHER_LABELS = {
+    "district": "District",
+    "state": "State",
+    "country": "Country",
+    "current": "Current weather",
+    "forecast": "Forecast",
+    "date": "Date",
+    "temp_c": "Temperature (°C)",
+    "temp_f": "Temperature (°F)",
+    "is_day": "Daytime",
+    "condition": "Condition",
+    "feelslike_c": "Feels like (°C)",
+    "feelslike_f": "Feels like (°F)",
+    "precip_mm": "Rainfall (mm)",
+    "precip_in": "Rainfall (in)",
+    "dewpoint_c": "Dew point (°C)",
+    "dewpoint_f": "Dew point (°F)",
+    "humidity": "Humidity (%)",
+    "cloud": "Cloud cover (%)",
+    "vis_km": "Visibility (km)",
+    "vis_miles": "Visibility (miles)",
+    "uv": "UV index",
+    "maxtemp_c": "Maximum temperature (°C)",
+    "maxtemp_f": "Maximum temperature (°F)",
+    "mintemp_c": "Minimum temperature (°C)",
+    "mintemp_f": "Minimum temperature (°F)",
+    "avgtemp_c": "Average temperature (°C)",
+    "avgtemp_f": "Average temperature (°F)",
+    "totalprecip_mm": "Total rainfall (mm)",
+    "totalprecip_in": "Total rainfall (in)",
+    "maxwind_mph": "Maximum wind (mph)",
+    "maxwind_kph": "Maximum wind (km/h)",
+    "avghumidity": "Average humidity (%)",
+    "daily_will_it_rain": "Rain expected",
+    "daily_chance_of_rain": "Chance of rain (%)",
+    "daily_will_it_snow": "Snow expected",
+    "daily_chance_of_snow": "Chance of snow (%)",
+    "sunrise": "Sunrise",
+    "sunset": "Sunset",
+    "moonrise": "Moonrise",
+    "moonset": "Moonset",
+}
+
+# Seed translations, anything missing here is learned once through the LLM and kept in Redis
+STATIC_TRANSLATIONS = {
+    "hi": {
+        "Sunny": "धूप",
+        "Clear": "साफ़",
+        "Partly cloudy": "आंशिक रूप से बादल",
+        "Cloudy": "बादल",
+        "Overcast": "घने बादल",
+        "Mist": "धुंध",
+        "Fog": "कोहरा",
+        "Patchy rain possible": "कहीं-कहीं बारिश की संभावना",
+        "Patchy rain nearby": "आसपास कहीं-कहीं बारिश",
+        "Patchy light drizzle": "कहीं-कहीं हल्की बूंदाबांदी",
+        "Light drizzle": "हल्की बूंदाबांदी",
+        "Patchy light rain": "कहीं-कहीं हल्की बारिश",
+        "Light rain": "हल्की बारिश",
+        "Moderate rain at times": "कभी-कभी मध्यम बारिश",
+        "Moderate rain": "मध्यम बारिश",
+        "Heavy rain at times": "कभी-कभी भारी बारिश",
+        "Heavy rain": "भारी बारिश",
+        "Light rain shower": "हल्की बौछार",
+        "Moderate or heavy rain shower": "मध्यम या भारी बौछार",
+        "Torrential rain shower": "मूसलाधार बारिश",
+        "Thundery outbreaks possible": "गरज के साथ बौछार की संभावना",
+        "Thundery outbreaks in nearby": "आसपास गरज के साथ बौछार",
+        "Patchy light rain with thunder": "गरज के साथ कहीं-कहीं हल्की बारिश",
+        "Patchy light rain in area with thunder": "गरज के साथ कहीं-कहीं हल्की बारिश",
+        "Moderate or heavy rain with thunder": "गरज के साथ मध्यम या भारी बारिश",
+        "Moderate or heavy rain in area with thunder": "गरज के साथ मध्यम या भारी बारिश",
+        "AM": "पूर्वाह्न",
+        "PM": "अपराह्न",
+        "No moonrise": "चंद्रोदय नहीं",
+        "No moonset": "चंद्रास्त नहीं",
+        "India": "भारत",
+        "District": "ज़िला",
+        "State": "राज्य",
+        "Country": "देश",
+        "Current weather": "वर्तमान मौसम",
+        "Forecast": "पूर्वानुमान",
+        "Date": "तारीख",
+        "Temperature (°C)": "तापमान (°C)",
+        "Temperature (°F)": "तापमान (°F)",
+        "Daytime": "दिन",
+        "Condition": "मौसम",
+        "Feels like (°C)": "महसूस तापमान (°C)",
+        "Feels like (°F)": "महसूस तापमान (°F)",
+        "Rainfall (mm)": "वर्षा (मिमी)",
+        "Rainfall (in)": "वर्षा (इंच)",
+        "Dew point (°C)": "ओस बिंदु (°C)",
+        "Dew point (°F)": "ओस बिंदु (°F)",
+        "Humidity (%)": "नमी (%)",
+        "Cloud cover (%)": "बादल (%)",
+        "Visibility (km)": "दृश्यता (किमी)",
+        "Visibility (miles)": "दृश्यता (मील)",
+        "UV index": "यूवी सूचकांक",
+        "Maximum temperature (°C)": "अधिकतम तापमान (°C)",
+        "Maximum temperature (°F)": "अधिकतम तापमान (°F)",
+        "Minimum temperature (°C)": "न्यूनतम तापमान (°C)",
+        "Minimum temperature (°F)": "न्यूनतम तापमान (°F)",
+        "Average temperature (°C)": "औसत तापमान (°C)",
+        "Average temperature (°F)": "औसत तापमान (°F)",
+        "Total rainfall (mm)": "कुल वर्षा (मिमी)",
+        "Total rainfall (in)": "कुल वर्षा (इंच)",
+        "Maximum wind (mph)": "अधिकतम हवा (मील/घंटा)",
+        "Maximum wind (km/h)": "अधिकतम हवा (किमी/घंटा)",
+        "Average humidity (%)": "औसत नमी (%)",
+        "Rain expected": "बारिश की उम्मीद",
+        "Chance of rain (%)": "बारिश की संभावना (%)",
+        "Snow expected": "बर्फ़बारी की उम्मीद",
+        "Chance of snow (%)": "बर्फ़बारी की संभावना (%)",
+        "Sunrise": "सूर्योदय",
+        "Sunset": "सूर्यास्त",
+        "Moonrise": "चंद्रोदय",
+        "Moonset": "चंद्रास्त",
+    },
+}
+
+def normalize_language(language: str) -> str:
+    language = (language or "en").strip().lower()
+    return LANGUAGE_ALIASES.get(language, language)
+
+def language_name(language: str) -> str:
+    """"or" -> "Odia", for prompts; unknown codes are returned as given"""
+    code = normalize_language(language)
+    names = {code: name for name, code in LANGUAGE_ALIASES.items()}
+    return names[code].capitalize() if code in names else language
+
+def static_translations(language: str) -> Dict[str, str]:
+    return STATIC_TRANSLATIONS.get(normalize_language(language), {})
+
+def localize_digits(value, language: str) -> str:
+    text = str(value)
+    digits = DIGITS.get(normalize_language(language))
+    return text.translate(str.maketrans("0123456789", digits)) if digits else text
+
+def _time_words(time_text: str) -> list[str]:
+    """"06:12 AM" -> ["AM"], "No moonrise" -> ["No moonrise"]"""
+    if any(ch.isdigit() for ch in time_text):
+        return [part for part in time_text.split() if not any(ch.isdigit() for ch in part)]
+    return [time_text]
+
+def weather_texts(weather_data: Dict[str, Any]) -> set[str]:
+    """Every piece of text in a formatted forecast (plus the labels) that needs a translation"""
+    texts = {label for label in WEATHER_LABELS.values()}
+    texts.update(weather_data.get(field) for field in ("district", "state", "country"))
+    texts.add(weather_data.get("current", {}).get("condition"))
+    for day in weather_data.get("forecast", []):
+        texts.add(day.get("day", {}).get("condition"))
+        for time_text in day.get("astro", {}).values():
+            texts.update(_time_words(str(time_text)))
+    return {text.strip() for text in texts if isinstance(text, str) and text.strip()}
+
+def localize_weather(weather_data: Dict[str, Any], translations: Dict[str, str], language: str) -> Dict[str, Any]:
+    """Apply text translations and the language's digit script to a formatted forecast.
+
+    Numbers become digit-localized strings, text is looked up in `translations`
+    (falling back to the original), and a `labels` map of localized field names is added.
+    """
+    # weatherapi isn't consistent about case ("Partly Cloudy " vs "Partly cloudy")
+    folded = {k.strip().casefold(): v for k, v in translations.items()}
+    has_digits = normalize_language(language) in DIGITS
+
+    def text(value: str) -> str:
+        return folded.get(value.strip().casefold(), value)
+
+    def localize(key, value):
+        if isinstance(value, dict):
+            return {k: localize(k, v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [localize(key, v) for v in value]
+        if isinstance(value, bool) or value is None:
+            return value
+        if isinstance(value, (int, float)):
+            return localize_digits(value, language) if has_digits else value
+        if key in ("sunrise", "sunset", "moonrise", "moonset"):
+            if not any(ch.isdigit() for ch in value):
+                return text(value)
+            return " ".join(localize_digits(text(part), language) for part in value.split())
+        if key == "date":
+            return localize_digits(value, language)
+        return text(value)
+
+    localized = localize(None, weather_data)
+    localized["labels"] = {field: text(label) for field, label in WEATHER_LABELS.items()}
+    return localized
@@ -0,0 +1,203 @@
+import os
+import sqlite3
+import asyncio
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from config.settings import settings
+from lib.http import get_with_retry
+
+OGD_MANDI_URL = "https://api.data.gov.in/resource/9ef84268-d588-465a-a308-a864a43d0070"
+
+FILTER_FIELDS = ("state", "district", "market", "commodity", "variety", "grade")
+
+# Upstream filter parameter for each field, as accepted by the OGD API
+UPSTREAM_FILTERS = {
+    "state": "filters[state.keyword]",
+    "district": "filters[district]",
+    "market": "filters[market]",
+    "commodity": "filters[commodity]",
+    "variety": "filters[variety]",
+    "grade": "filters[grade]",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mandi_prices (
+    state TEXT NOT NULL COLLATE NOCASE,
+    district TEXT NOT NULL COLLATE NOCASE,
+    market TEXT NOT NULL COLLATE NOCASE,
+    commodity TEXT NOT NULL COLLATE NOCASE,
+    variety TEXT NOT NULL COLLATE NOCASE,
+    grade TEXT NOT NULL COLLATE NOCASE,
+    arrival_date TEXT NOT NULL,
+    min_price REAL,
+    max_price REAL,
+    modal_price REAL,
+    PRIMARY KEY (state, district, market, commodity, variety, grade, arrival_date)
+);
+CREATE INDEX IF NOT EXISTS idx_mandi_commodity ON mandi_prices (commodity, variety, arrival_date);
+CREATE INDEX IF NOT EXISTS idx_mandi_market ON mandi_prices (market, commodity, arrival_date);
+CREATE INDEX IF NOT EXISTS idx_mandi_district ON mandi_prices (district, commodity, arrival_date);
+CREATE INDEX IF NOT EXISTS idx_mandi_arrival ON mandi_prices (arrival_date);
+CREATE TABLE IF NOT EXISTS mandi_sync (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_arrival_date TEXT,
+    synced_at TEXT
+);
+"""
+
+_schema_ready = False
+
+@contextmanager
+def connect():
+    """Short-lived connection to the mirror, committed and closed on exit"""
+    global _schema_ready
+    if not _schema_ready:
+        os.makedirs(os.path.dirname(os.path.abspath(settings.mandi_db_path)), exist_ok=True)
+    conn = sqlite3.connect(settings.mandi_db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        if not _schema_ready:
+            # WAL lets API readers keep querying while the ingester writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            _schema_ready = True
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def to_iso_date(arrival_date: str) -> str:
+    """OGD dates are dd/mm/yyyy, store them as yyyy-mm-dd so they sort"""
+    return datetime.strptime(arrival_date, "%d/%m/%Y").date().isoformat()
+
+def to_ogd_date(iso_date: str) -> str:
+    return date.fromisoformat(iso_date).strftime("%d/%m/%Y")
+
+def _price(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _row(record: Dict[str, Any]) -> tuple:
+    return (
+        *[(record.get(field) or "").strip() for field in FILTER_FIELDS],
+        to_iso_date(record["arrival_date"]),
+        _price(record.get("min_price")),
+        _price(record.get("max_price")),
+        _price(record.get("modal_price")),
+    )
+
+def _record(row: sqlite3.Row) -> Dict[str, Any]:
+    record = dict(row)
+    record["arrival_date"] = to_ogd_date(record["arrival_date"])
+    return record
+
+##### READS #####
+
+def _query_prices(filters: Dict[str, str], limit: int, offset: int) -> List[Dict[str, Any]]:
+    clauses = [f"{field} = ?" for field in FILTER_FIELDS if filters.get(field)]
+    values = [filters[field] for field in FILTER_FIELDS if filters.get(field)]
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with connect() as conn:
+        rows = conn.execute(
+            f"SELECT * FROM mandi_prices {where} ORDER BY arrival_date DESC, market, commodity LIMIT ? OFFSET ?",
+            (*values, limit, offset),
+        ).fetchall()
+    return [_record(row) for row in rows]
+
+async def query_prices(filters: Dict[str, str], limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+    """Filter and page the local mirror, newest arrivals first"""
+    return await asyncio.to_thread(_query_prices, filters, limit, offset)
+
+async def fetch_upstream(filters: Dict[str, str], limit: int = 10, offset: int = 0, arrival_date: str = None) -> Dict[str, Any]:
+    """Query the OGD API directly, returns the decoded response body"""
+    params = {
+        "api-key": settings.ogd_api_key,
+        "format": "json",
+        "limit": limit,
+        "offset": offset,
+    }
+    for field, param in UPSTREAM_FILTERS.items():
+        if filters.get(field):
+            params[param] = filters[field]
+    if arrival_date:
+        params["filters[arrival_date]"] = arrival_date
+
+    response = await get_with_retry(
+        OGD_MANDI_URL, params=params, metric="ogd_market", timeout=settings.market_api_timeout
+    )
+    response.raise_for_status()
+    return response.json()
+
+##### INGESTION #####
+
+def upsert_records(records: List[Dict[str, Any]]) -> int:
+    rows = []
+    for record in records:
+        try:
+            rows.append(_row(record))
+        except (KeyError, ValueError):
+            continue
+    with connect() as conn:
+        conn.executemany("INSERT OR REPLACE INTO mandi_prices VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+def get_last_arrival_date() -> Optional[str]:
+    with connect() as conn:
+        row = conn.execute("SELECT last_arrival_date FROM mandi_sync WHERE id = 1").fetchone()
+    return row["last_arrival_date"] if row else None
+
+def set_last_arrival_date(iso_date: str) -> None:
+    with connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO mandi_sync (id, last_arrival_date, synced_at) VALUES (1, ?, ?)",
+            (iso_date, datetime.utcnow().isoformat()),
+        )
+
+async def _ingest(arrival_date: str = None) -> tuple[int, Optional[str]]:
+    """Page through the resource (optionally for one dd/mm/yyyy date), returns (rows, latest iso date)"""
+    page_size = settings.mandi_sync_page_size
+    offset, stored, latest = 0, 0, None
+    while True:
+        data = await fetch_upstream({}, limit=page_size, offset=offset, arrival_date=arrival_date)
+        records = data.get("records", [])
+        if not records:
+            break
+        stored += await asyncio.to_thread(upsert_records, records)
+        for record in records:
+            try:
+                iso = to_iso_date(record["arrival_date"])
+            except (KeyError, ValueError):
+                continue
+            latest = max(latest or iso, iso)
+        offset += len(records)
+        if len(records) < page_size:
+            break
+    return stored, latest
+
+async def sync_mandi_prices() -> Dict[str, Any]:
+    """Pull new arrival dates into the mirror.
+
+    The first run pulls the whole resource. After that only dates from the
+    last synced arrival date (re-fetched, since mandis report late) up to
+    today are requested.
+    """
+    last = await asyncio.to_thread(get_last_arrival_date)
+    if last is None:
+        stored, latest = await _ingest()
+        dates = ["all"]
+    else:
+        start, today = date.fromisoformat(last), date.today()
+        dates = [(start + timedelta(days=i)).isoformat() for i in range((today - start).days + 1)]
+        stored, latest = 0, last
+        for iso in dates:
+            count, day_latest = await _ingest(to_ogd_date(iso))
+            stored += count
+            latest = max(latest, day_latest or latest)
+
+    if latest:
+        await asyncio.to_thread(set_last_arrival_date, latest)
+    return {"dates": dates, "rows": stored, "last_arrival_date": latest}
@@ -0,0 +1,47 @@
+import time
+from contextlib import asynccontextmanager
+
+import redis.asyncio as aioredis
+
+from lib.redis import async_pool
+
+client = aioredis.Redis(connection_pool=async_pool)
+
+# recent samples kept per metric for percentiles
+SAMPLE_SIZE = 1000
+
+async def record_latency(name: str, seconds: float) -> None:
+    """Record one latency sample (in ms) under metrics:latency:{name}"""
+    ms = round(seconds * 1000, 2)
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.hincrby(f"metrics:latency:{name}", "count", 1)
+            pipe.hincrbyfloat(f"metrics:latency:{name}", "total_ms", ms)
+            pipe.lpush(f"metrics:latency:{name}:samples", ms)
+            pipe.ltrim(f"metrics:latency:{name}:samples", 0, SAMPLE_SIZE - 1)
+            await pipe.execute()
+    except Exception as e:
+        print(f"Metrics error: {e}")
+
+async def incr(name: str, amount: int = 1) -> None:
+    """Increment the counter metrics:counter:{name}"""
+    try:
+        await client.incrby(f"metrics:counter:{name}", amount)
+    except Exception as e:
+        print(f"Metrics error: {e}")
+
+@asynccontextmanager
+async def timed(name: str, timings: dict = None):
+    """Record how long the wrapped block takes, whether or not it raises.
+
+    If `timings` is given the duration (ms) is also stored in it, under the
+    last `:` segment of `name` ("voice_chat:stt" -> timings["stt"]).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if timings is not None:
+            timings[name.rsplit(":", 1)[-1]] = round(elapsed * 1000, 2)
+        await record_latency(name, elapsed)
@@ -0,0 +1,205 @@
+import asyncio
+import warnings
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from lib.mandi import connect
+
+@dataclass
+class PriceSeries:
+    """Columnar prices for one (state, commodity[, variety]).
+
+    Row i of every matrix is the series for keys[i] = (district, market, variety),
+    column j is dates[j]. Days without an arrival are NaN.
+    """
+    keys: List[Tuple[str, str, str]]
+    dates: np.ndarray
+    modal: np.ndarray
+    min: np.ndarray
+    max: np.ndarray
+
+def _load_series(state: str, commodity: str, variety: str, days: int) -> PriceSeries:
+    start = (date.today() - timedelta(days=days - 1)).isoformat()
+    where = "WHERE state = ? AND commodity = ? AND arrival_date >= ?"
+    params = [state, commodity, start]
+    if variety:
+        where += " AND variety = ?"
+        params.append(variety)
+
+    # Grades of the same market/variety/day are averaged into one price. The series index
+    # and day offset are computed in SQL, so the rows come back as plain numbers that
+    # convert to a matrix in one step instead of being walked in Python.
+    with connect() as conn:
+        # both reads must see the same sync
+        conn.execute("BEGIN")
+        keys = [tuple(row) for row in conn.execute(
+            f"SELECT DISTINCT district, market, variety FROM mandi_prices {where} ORDER BY district, market, variety",
+            params,
+        )]
+        cursor = conn.execute(
+            "SELECT DENSE_RANK() OVER (ORDER BY district, market, variety) - 1, "
+            "CAST(julianday(arrival_date) - julianday(?) AS INTEGER), "
+            "AVG(modal_price), AVG(min_price), AVG(max_price) "
+            f"FROM mandi_prices {where} GROUP BY district, market, variety, arrival_date",
+            [start, *params],
+        )
+        cursor.row_factory = None
+        rows = cursor.fetchall()
+
+    dates = np.arange(np.datetime64(start), np.datetime64(date.today()) + 1)
+    if not rows:
+        empty = np.empty((0, len(dates)))
+        return PriceSeries([], dates, empty, empty.copy(), empty.copy())
+
+    # None (a missing price) becomes NaN
+    values = np.array(rows, dtype=float)
+    row_idx, day_idx = values[:, 0].astype(np.intp), values[:, 1].astype(np.intp)
+    matrices = []
+    for column in (2, 3, 4):
+        matrix = np.full((len(keys), len(dates)), np.nan)
+        matrix[row_idx, day_idx] = values[:, column]
+        matrices.append(matrix)
+    return PriceSeries(keys, dates, *matrices)
+
+class PriceSeriesStore:
+    """In-process cache of PriceSeries, rebuilt when the mandi mirror syncs again"""
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._cache: Dict[tuple, Tuple[Optional[str], PriceSeries]] = {}
+
+    def _synced_at(self) -> Optional[str]:
+        with connect() as conn:
+            row = conn.execute("SELECT synced_at FROM mandi_sync WHERE id = 1").fetchone()
+        return row["synced_at"] if row else None
+
+    def _get(self, state: str, commodity: str, variety: str, days: int) -> PriceSeries:
+        key = (state.lower(), commodity.lower(), variety.lower(), days, date.today())
+        synced_at = self._synced_at()
+        cached = self._cache.get(key)
+        if cached and cached[0] == synced_at:
+            return cached[1]
+        series = _load_series(state, commodity, variety, days)
+        if len(self._cache) >= self.max_entries:
+            self._cache.pop(next(iter(self._cache)))
+        self._cache[key] = (synced_at, series)
+        return series
+
+    async def get(self, state: str, commodity: str, variety: str = "", days: int = 365) -> PriceSeries:
+        return await asyncio.to_thread(self._get, state, commodity, variety, days)
+
+price_series_store = PriceSeriesStore()
+
+def _rolling_nanmean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over `window` days along axis 1, ignoring missing days"""
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0), axis=1)
+    counts = np.cumsum(valid, axis=1)
+    pad = np.zeros((values.shape[0], 1))
+    sums = np.concatenate([pad, sums], axis=1)
+    counts = np.concatenate([pad, counts], axis=1)
+    lo = np.maximum(np.arange(1, values.shape[1] + 1) - window, 0)
+    window_sums = sums[:, 1:] - sums[:, lo]
+    window_counts = counts[:, 1:] - counts[:, lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(window_counts > 0, window_sums / window_counts, np.nan)
+
+def _last_valid(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Index of the last non-NaN column in each row, and whether the row has any"""
+    valid = ~np.isnan(values)
+    has_value = valid.any(axis=1)
+    last = values.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    return last, has_value
+
+def _round(value) -> Optional[float]:
+    return None if value is None or np.isnan(value) else round(float(value), 2)
+
+def analyse(series: PriceSeries, market: str = "", district: str = "", history_days: int = 30) -> Dict[str, Any]:
+    """Moving averages, percentiles, week-over-week change and the best nearby market.
+
+    Statistics are computed for every series at once; the target is the
+    requested market's series, or the state-wide daily median when no
+    market is given. The returned `market` is the matched market's name,
+    empty when the numbers are state-wide (including when `market` matched
+    nothing).
+    """
+    if not series.keys:
+        return {}
+
+    modal = series.modal
+    ma7 = _rolling_nanmean(modal, 7)
+    ma30 = _rolling_nanmean(modal, 30)
+    last, has_value = _last_valid(modal)
+    rows = np.arange(len(series.keys))
+    latest = np.where(has_value, modal[rows, last], np.nan)
+    # all-NaN slices (no arrivals that week) are expected and come out as NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        this_week = np.nanmean(modal[:, -7:], axis=1)
+        last_week = np.nanmean(modal[:, -14:-7], axis=1)
+        wow = (this_week - last_week) / last_week * 100
+        state_median = np.nanmedian(modal, axis=0)
+
+    target = None
+    if market:
+        matches = [i for i, (d, m, _) in enumerate(series.keys) if m.lower() == market.lower()]
+        if matches:
+            # pick the variety with the most recent arrival
+            target = max(matches, key=lambda i: (has_value[i], last[i]))
+            district = district or series.keys[target][0]
+
+    if target is not None:
+        target_prices, target_ma7, target_ma30 = modal[target], ma7[target], ma30[target]
+        target_latest, target_wow = latest[target], wow[target]
+        as_of = series.dates[last[target]] if has_value[target] else None
+    else:
+        target_prices = state_median
+        target_ma7 = _rolling_nanmean(state_median[None, :], 7)[0]
+        target_ma30 = _rolling_nanmean(state_median[None, :], 30)[0]
+        target_last, target_has = _last_valid(state_median[None, :])
+        target_latest = state_median[target_last[0]] if target_has[0] else np.nan
+        as_of = series.dates[target_last[0]] if target_has[0] else None
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            target_wow = (np.nanmean(state_median[-7:]) - np.nanmean(state_median[-14:-7])) / np.nanmean(state_median[-14:-7]) * 100
+
+    observed = target_prices[~np.isnan(target_prices)]
+    percentiles = dict(zip(("p10", "p25", "p50", "p75", "p90"), np.percentile(observed, [10, 25, 50, 75, 90]))) if observed.size else {}
+    percentile_rank = float((observed <= target_latest).mean() * 100) if observed.size and not np.isnan(target_latest) else np.nan
+
+    # Best place to sell: highest recent modal price in the same district, else anywhere in the state
+    nearby = np.array([d.lower() == district.lower() for d, _, _ in series.keys]) if district else np.ones(len(rows), dtype=bool)
+    recent_arrival = has_value & (last >= len(series.dates) - 7)
+    candidates = nearby & recent_arrival
+    if not candidates.any():
+        candidates = recent_arrival if recent_arrival.any() else has_value
+    best_market = None
+    if candidates.any():
+        best = int(np.nanargmax(np.where(candidates, latest, -np.inf)))
+        best_market = {
+            "district": series.keys[best][0],
+            "market": series.keys[best][1],
+            "variety": series.keys[best][2],
+            "modal_price": _round(latest[best]),
+            "arrival_date": str(series.dates[last[best]]),
+        }
+
+    recent = slice(-history_days, None)
+    return {
+        "market": series.keys[target][1] if target is not None else "",
+        "as_of": str(as_of) if as_of is not None else None,
+        "latest_modal_price": _round(target_latest),
+        "moving_average_7d": _round(target_ma7[-1]),
+        "moving_average_30d": _round(target_ma30[-1]),
+        "week_over_week_change_pct": _round(target_wow),
+        "percentile_rank": _round(percentile_rank),
+        "percentiles": {k: _round(v) for k, v in percentiles.items()},
+        "best_market": best_market,
+        "markets_compared": int(candidates.sum()),
+        "history": [
+            {"date": str(d), "modal_price": _round(p), "moving_average_7d": _round(m)}
+            for d, p, m in zip(series.dates[recent], target_prices[recent], target_ma7[recent])
+        ],
+    }
@@ -1,60 +1,253 @@
 import uuid
 import json
 import redis
+import redis.asyncio as aioredis
 from datetime import datetime
 from typing import List, Dict, Optional
 
+# Merges a JSON patch into the last element of a list in a single round trip,
+# so concurrent appends can't interleave between the read and the write.
+UPDATE_LAST_MESSAGE_SCRIPT = """
+local raw = redis.call('LINDEX', KEYS[1], -1)
+if not raw then
+    return 0
+end
+local message = cjson.decode(raw)
+for k, v in pairs(cjson.decode(ARGV[1])) do
+    message[k] = v
+end
+redis.call('LSET', KEYS[1], -1, cjson.encode(message))
+return 1
+"""
+
+# Folds the oldest ARGV[1] messages into the stored summary. The id of the
+# last folded message is checked first so a concurrent clear/compaction can't
+# make us drop turns that were never summarised.
+COMPACT_HISTORY_SCRIPT = """
+local last = redis.call('LINDEX', KEYS[1], tonumber(ARGV[1]) - 1)
+if not last or cjson.decode(last)['id'] ~= ARGV[2] then
+    return 0
+end
+redis.call('LTRIM', KEYS[1], tonumber(ARGV[1]), -1)
+redis.call('SET', KEYS[2], ARGV[3])
+return 1
+"""
+
+# Shared connection pools, one per process, so every client instance reuses
+# the same sockets instead of opening its own.
+sync_pool = redis.ConnectionPool(
+    host="localhost",
+    port=6379,
+    db=0,
+    decode_responses=True  # Automatically decode responses to strings
+)
+async_pool = aioredis.ConnectionPool(
+    host="localhost",
+    port=6379,
+    db=0,
+    decode_responses=True
+)
+
+def chat_key(user_id: str) -> str:
+    return f"chat:{user_id}"
+
+def summary_key(user_id: str) -> str:
+    return f"chat_summary:{user_id}"
+
+def compaction_lock_key(user_id: str) -> str:
+    return f"chat_compaction:{user_id}"
+
+# Set once every legacy chat blob has been converted, see `Redis.migrate_chat_histories`
+MIGRATION_DONE_KEY = "chat_migration:done"
+
+def prepare_messages(message: Dict | List[Dict]) -> List[str]:
+    """Fill in missing id/timestamp and serialise message(s) for RPUSH"""
+    now = datetime.utcnow().isoformat()
+    messages = message if isinstance(message, list) else [message]
+    for msg in messages:
+        if 'id' not in msg:
+            msg['id'] = str(uuid.uuid4())
+        if 'timestamp' not in msg:
+            msg['timestamp'] = now
+    return [json.dumps(msg) for msg in messages]
+
 class Redis:
+    """Synchronous client, used by the Celery worker"""
     def __init__(self):
-        self.client = redis.Redis(
-            host="localhost", 
-            port=6379, 
-            db=0,
-            decode_responses=True  # Automatically decode responses to strings
-        )
-
-    def add_message(self, user_id: str, message: Dict) -> None:
-        """Add a message(s) to user's chat history"""
-        now = datetime.utcnow().isoformat()
-        # Get existing history
-        history = self.get_chat_history(user_id)
-        
-        if isinstance(message, list):
-            for msg in message:
-                if 'id' not in msg:
-                    msg['id'] = str(uuid.uuid4())
-                if 'timestamp' not in msg:
-                    msg['timestamp'] = now
-            history.extend(message)
-        else:
-            if 'id' not in message:
-                message['id'] = str(uuid.uuid4())
-            if 'timestamp' not in message:
-                message['timestamp'] = now
-            history.append(message)
-        
-        # Store back to Redis
-        self.client.set(f"chat:{user_id}", json.dumps(history))
-    
+        self.client = redis.Redis(connection_pool=sync_pool)
+        self._update_last_message = self.client.register_script(UPDATE_LAST_MESSAGE_SCRIPT)
+        self._compact_history = self.client.register_script(COMPACT_HISTORY_SCRIPT)
+        # True once the one-time migration has finished, after that no key needs checking
+        self._migration_done = False
+
+    def _migrate_legacy_history(self, user_id: str) -> None:
+        """Convert a legacy `chat:{user_id}` JSON string into a Redis list, until the bulk migration has run"""
+        if self._migration_done:
+            return
+        if self.client.exists(MIGRATION_DONE_KEY):
+            self._migration_done = True
+            return
+        self._convert_legacy_history(user_id)
+
+    def _convert_legacy_history(self, user_id: str) -> None:
+        key = chat_key(user_id)
+
+        def convert(pipe):
+            if pipe.type(key) != "string":
+                return
+            history = json.loads(pipe.get(key) or "[]")
+            pipe.multi()
+            pipe.delete(key)
+            if history:
+                pipe.rpush(key, *[json.dumps(msg) for msg in history])
+
+        self.client.transaction(convert, key)
+
+    def migrate_chat_histories(self) -> int:
+        """Convert every legacy chat blob to the list layout, returns the number of keys converted"""
+        converted = 0
+        for key in self.client.scan_iter(match="chat:*", _type="string"):
+            self._convert_legacy_history(key.split(":", 1)[1])
+            converted += 1
+        self.client.set(MIGRATION_DONE_KEY, 1)
+        self._migration_done = True
+        return converted
+
+    def add_message(self, user_id: str, message: Dict) -> int:
+        """Add a message(s) to user's chat history, returns the new history length"""
+        self._migrate_legacy_history(user_id)
+        messages = prepare_messages(message)
+        if not messages:
+            return self.client.llen(chat_key(user_id))
+        return self.client.rpush(chat_key(user_id), *messages)
+
     def get_chat_history(self, user_id: str) -> List[Dict]:
         """Get full chat history for a user"""
-        history_str = self.client.get(f"chat:{user_id}")
-        if history_str:
-            return json.loads(history_str)
-        return []
-    
+        self._migrate_legacy_history(user_id)
+        return [json.loads(msg) for msg in self.client.lrange(chat_key(user_id), 0, -1)]
+
     def get_recent_messages(self, user_id: str, limit: int = 10) -> List[Dict]:
         """Get recent messages from chat history"""
-        history = self.get_chat_history(user_id)
-        return history[-limit:] if history else []
-    
+        self._migrate_legacy_history(user_id)
+        return [json.loads(msg) for msg in self.client.lrange(chat_key(user_id), -limit, -1)]
+
     def clear_chat_history(self, user_id: str) -> None:
         """Clear chat history for a user"""
-        self.client.delete(f"chat:{user_id}")
-    
+        self.client.delete(chat_key(user_id), summary_key(user_id))
+
     def update_last_message(self, user_id: str, update_data: Dict) -> None:
         """Update the last message (useful for adding tool calls or other metadata)"""
-        history = self.get_chat_history(user_id)
-        if history:
-            history[-1].update(update_data)
-            self.client.set(f"chat:{user_id}", json.dumps(history))
+        self._migrate_legacy_history(user_id)
+        self._update_last_message(keys=[chat_key(user_id)], args=[json.dumps(update_data)])
+
+    def history_length(self, user_id: str) -> int:
+        """Number of raw messages currently stored for a user"""
+        self._migrate_legacy_history(user_id)
+        return self.client.llen(chat_key(user_id))
+
+    def get_oldest_messages(self, user_id: str, count: int) -> List[Dict]:
+        """Get the first `count` messages of the chat history"""
+        self._migrate_legacy_history(user_id)
+        return [json.loads(msg) for msg in self.client.lrange(chat_key(user_id), 0, count - 1)]
+
+    def get_summary(self, user_id: str) -> Optional[str]:
+        """Get the rolling summary of compacted turns, if any"""
+        return self.client.get(summary_key(user_id))
+
+    def compact_history(self, user_id: str, summary: str, messages: List[Dict]) -> bool:
+        """Replace `messages` (the oldest turns in the history) with `summary`"""
+        if not messages:
+            return False
+        return bool(self._compact_history(
+            keys=[chat_key(user_id), summary_key(user_id)],
+            args=[len(messages), messages[-1]['id'], summary],
+        ))
+
+    def release_compaction(self, user_id: str) -> None:
+        self.client.delete(compaction_lock_key(user_id))
+
+
+class AsyncRedis:
+    """asyncio client for the API routes and the bot, backed by the shared async pool"""
+    def __init__(self):
+        self.client = aioredis.Redis(connection_pool=async_pool)
+        self._update_last_message = self.client.register_script(UPDATE_LAST_MESSAGE_SCRIPT)
+        self._migration_done = False
+
+    async def _migrate_legacy_history(self, user_id: str) -> None:
+        """Convert a legacy `chat:{user_id}` JSON string into a Redis list, until the bulk migration has run"""
+        if self._migration_done:
+            return
+        if await self.client.exists(MIGRATION_DONE_KEY):
+            self._migration_done = True
+            return
+        key = chat_key(user_id)
+
+        async def convert(pipe):
+            if await pipe.type(key) != "string":
+                return
+            history = json.loads(await pipe.get(key) or "[]")
+            pipe.multi()
+            pipe.delete(key)
+            if history:
+                pipe.rpush(key, *[json.dumps(msg) for msg in history])
+
+        await self.client.transaction(convert, key)
+
+    async def add_message(self, user_id: str, message: Dict) -> int:
+        """Add a message(s) to user's chat history, returns the new history length"""
+        await self._migrate_legacy_history(user_id)
+        messages = prepare_messages(message)
+        if not messages:
+            return await self.client.llen(chat_key(user_id))
+        return await self.client.rpush(chat_key(user_id), *messages)
+
+    async def get_chat_history(self, user_id: str) -> List[Dict]:
+        """Get full chat history for a user"""
+        await self._migrate_legacy_history(user_id)
+        return [json.loads(msg) for msg in await self.client.lrange(chat_key(user_id), 0, -1)]
+
+    async def get_recent_messages(self, user_id: str, limit: int = 10) -> List[Dict]:
+        """Get recent messages from chat history"""
+        await self._migrate_legacy_history(user_id)
+        return [json.loads(msg) for msg in await self.client.lrange(chat_key(user_id), -limit, -1)]
+
+    async def clear_chat_history(self, user_id: str) -> None:
+        """Clear chat history for a user"""
+        await self.client.delete(chat_key(user_id), summary_key(user_id))
+
+    async def update_last_message(self, user_id: str, update_data: Dict) -> None:
+        """Update the last message (useful for adding tool calls or other metadata)"""
+        await self._migrate_legacy_history(user_id)
+        await self._update_last_message(keys=[chat_key(user_id)], args=[json.dumps(update_data)])
+
+    async def get_summary(self, user_id: str) -> Optional[str]:
+        """Get the rolling summary of compacted turns, if any"""
+        return await self.client.get(summary_key(user_id))
+
+    async def claim_compaction(self, user_id: str, timeout: int = 600) -> bool:
+        """Take the per-user compaction lock so only one compaction job is queued at a time"""
+        return bool(await self.client.set(compaction_lock_key(user_id), 1, nx=True, ex=timeout))
+
+    async def release_compaction(self, user_id: str) -> None:
+        await self.client.delete(compaction_lock_key(user_id))
+
+    async def add_alert_subscription(self, farmer_id: str, topic: str, token: str) -> None:
+        """Remember a device's location topic so its language variant can be moved later"""
+        await self.client.sadd(f"alert_subscriptions:{farmer_id}", json.dumps([topic, token]))
+
+    async def get_alert_subscriptions(self, farmer_id: str) -> List[tuple]:
+        """(location topic, FCM token) pairs registered for a farmer"""
+        return [tuple(json.loads(item)) for item in await self.client.smembers(f"alert_subscriptions:{farmer_id}")]
+
+    async def get_translations(self, namespace: str, language: str, values: List[str]) -> Dict[str, str]:
+        """Look up known translations of `values` in the per-language dictionary"""
+        if not values:
+            return {}
+        translated = await self.client.hmget(f"translations:{namespace}:{language}", values)
+        return {value: t for value, t in zip(values, translated) if t is not None}
+
+    async def set_translations(self, namespace: str, language: str, translations: Dict[str, str]) -> None:
+        """Add translations ({value: translation}) to the per-language dictionary"""
+        if translations:
+            await self.client.hset(f"translations:{namespace}:{language}", mapping=translations)
@@ -0,0 +1,223 @@
+import json
+import time
+import hashlib
+import asyncio
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import httpx
+import redis.asyncio as aioredis
+
+from config.settings import settings
+from lib.http import http_client
+from lib.redis import async_pool
+
+# Caps concurrent weatherapi calls per process, shared by the route and the prewarm task
+upstream_semaphore = asyncio.Semaphore(settings.weather_fetch_concurrency)
+
+def format_forecast(forecast: Dict[str, Any]) -> Dict[str, Any]:
+    """Pick the fields we serve out of a weatherapi forecast.json response"""
+    return {
+        "district": forecast["location"]["name"],
+        "state": forecast["location"]["region"],
+        "country": forecast["location"]["country"],
+        "current": {
+            "temp_c": forecast["current"]["temp_c"],
+            "temp_f": forecast["current"]["temp_f"],
+            "is_day": forecast["current"]["is_day"],
+            "condition": forecast["current"]["condition"]["text"],
+            "feelslike_c": forecast["current"]["feelslike_c"],
+            "feelslike_f": forecast["current"]["feelslike_f"],
+            "precip_mm": forecast["current"]["precip_mm"],
+            "precip_in": forecast["current"]["precip_in"],
+            "dewpoint_c": forecast["current"]["dewpoint_c"],
+            "dewpoint_f": forecast["current"]["dewpoint_f"],
+            "humidity": forecast["current"]["humidity"],
+            "cloud": forecast["current"]["cloud"],
+            "vis_km": forecast["current"]["vis_km"],
+            "vis_miles": forecast["current"]["vis_miles"],
+            "uv": forecast["current"]["uv"],
+        },
+        "forecast": [
+            {
+                "date": day["date"],
+                "day": {
+                    "maxtemp_c": day["day"]["maxtemp_c"],
+                    "maxtemp_f": day["day"]["maxtemp_f"],
+                    "mintemp_c": day["day"]["mintemp_c"],
+                    "mintemp_f": day["day"]["mintemp_f"],
+                    "avgtemp_c": day["day"]["avgtemp_c"],
+                    "avgtemp_f": day["day"]["avgtemp_f"],
+                    "condition": day["day"]["condition"]["text"],
+                    "totalprecip_mm": day["day"]["totalprecip_mm"],
+                    "totalprecip_in": day["day"]["totalprecip_in"],
+                    "maxwind_mph": day["day"]["maxwind_mph"],
+                    "maxwind_kph": day["day"]["maxwind_kph"],
+                    "avghumidity": day["day"]["avghumidity"],
+                    "daily_will_it_rain": day["day"]["daily_will_it_rain"],
+                    "daily_chance_of_rain": day["day"]["daily_chance_of_rain"],
+                    "daily_will_it_snow": day["day"]["daily_will_it_snow"],
+                    "daily_chance_of_snow": day["day"]["daily_chance_of_snow"],
+                    "uv": day["day"]["uv"]
+                },
+                "astro": {
+                    "sunrise": day["astro"]["sunrise"],
+                    "sunset": day["astro"]["sunset"],
+                    "moonrise": day["astro"]["moonrise"],
+                    "moonset": day["astro"]["moonset"]
+                }
+            } for day in forecast["forecast"]["forecastday"]
+        ]
+    }
+
+async def fetch_forecast(district: str, state: str) -> Optional[Dict[str, Any]]:
+    """Fetch and format the 5 day forecast for one location from weatherapi"""
+    weather_url = f"http://api.weatherapi.com/v1/forecast.json?key={settings.weather_api_key}&q={district},{state}&days=5"
+    try:
+        async with upstream_semaphore:
+            response = await http_client.get(weather_url)
+    except httpx.HTTPError as e:
+        print(f"Error fetching weather for {district}, {state}: {e}")
+        return
+    if response.status_code != 200:
+        return
+    try:
+        data = response.json()
+    except ValueError as e:
+        print(f"Invalid weather response for {district}, {state}: {e}")
+        return
+    if not data:
+        return
+    return format_forecast(data)
+
+async def fetch_alerts(district: str, state: str) -> Optional[list[Dict[str, Any]]]:
+    """Fetch the active weather alerts for one location, None if the request failed"""
+    alerts_url = f"http://api.weatherapi.com/v1/alerts.json?key={settings.weather_api_key}&q={district},{state}"
+    try:
+        async with upstream_semaphore:
+            response = await http_client.get(alerts_url)
+    except httpx.HTTPError as e:
+        print(f"Error fetching alerts for {district}, {state}: {e}")
+        return
+    if response.status_code != 200:
+        return
+    try:
+        return (response.json().get("alerts") or {}).get("alert") or []
+    except (ValueError, AttributeError) as e:
+        # a malformed body fails this location only, not the whole alert run
+        print(f"Invalid alerts response for {district}, {state}: {e}")
+        return
+
+def alert_content_key(alert: Dict[str, Any]) -> str:
+    """Hash of what an alert says, so the same alert issued for many districts is handled once"""
+    content = {field: alert.get(field) for field in ("event", "headline", "desc", "instruction", "severity")}
+    return hashlib.sha1(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+class AlertFingerprints:
+    """Redis index of alerts already dispatched to a topic.
+
+    weatherapi keeps returning an alert until it expires, so each dispatched
+    (topic, alert) pair is recorded until the alert's own `expires` time.
+    The fingerprint covers the headline, validity window and content, so an
+    updated alert counts as new and is sent again.
+    """
+    default_ttl = 24 * 3600
+
+    def __init__(self):
+        self.client = aioredis.Redis(connection_pool=async_pool)
+
+    def key(self, topic: str, alert: Dict[str, Any]) -> str:
+        window = f"{alert.get('headline')}|{alert.get('effective')}|{alert.get('expires')}|{alert_content_key(alert)}"
+        return f"alert_sent:{topic}:{hashlib.sha1(window.encode('utf-8')).hexdigest()}"
+
+    def ttl(self, alert: Dict[str, Any]) -> int:
+        try:
+            remaining = datetime.fromisoformat(alert["expires"]).timestamp() - time.time()
+        except (KeyError, TypeError, ValueError):
+            return self.default_ttl
+        return max(int(remaining), 60)
+
+    async def unsent(self, items: list[tuple[str, Dict[str, Any]]]) -> list[tuple[str, Dict[str, Any]]]:
+        """Filter (topic, alert) pairs down to the ones not dispatched yet"""
+        if not items:
+            return []
+        async with self.client.pipeline(transaction=False) as pipe:
+            for topic, alert in items:
+                pipe.exists(self.key(topic, alert))
+            seen = await pipe.execute()
+        return [item for item, exists in zip(items, seen) if not exists]
+
+    async def mark_sent(self, items: list[tuple[str, Dict[str, Any]]]) -> None:
+        if not items:
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            for topic, alert in items:
+                pipe.set(self.key(topic, alert), 1, ex=self.ttl(alert))
+            await pipe.execute()
+
+alert_fingerprints = AlertFingerprints()
+
+def forecast_key(district: str, state: str) -> str:
+    return f"weather:{district.strip().lower()}:{state.strip().lower()}"
+
+class ForecastCache:
+    """Location-keyed forecast cache in Redis with stale-while-revalidate.
+
+    An entry is served as-is for `fresh_ttl` seconds. After that, and until
+    it expires at `max_ttl`, it is still served but a single background
+    refresh (guarded by a short lock) is kicked off. Only a cold miss waits
+    for weatherapi.
+    """
+    def __init__(
+        self,
+        fresh_ttl: int = settings.weather_cache_fresh_ttl,
+        max_ttl: int = settings.weather_cache_max_ttl,
+    ):
+        self.client = aioredis.Redis(connection_pool=async_pool)
+        self.fresh_ttl = fresh_ttl
+        self.max_ttl = max_ttl
+        # keys with a refresh in flight in this process, and the tasks running them
+        self._refreshing = set()
+        self._tasks = set()
+
+    async def store(self, district: str, state: str, forecast: Dict[str, Any]) -> None:
+        entry = {"fetched_at": time.time(), "forecast": forecast}
+        await self.client.set(forecast_key(district, state), json.dumps(entry), ex=self.max_ttl)
+
+    async def refresh(self, district: str, state: str) -> Optional[Dict[str, Any]]:
+        """Fetch from weatherapi and store, returns the new forecast (None on failure)"""
+        forecast = await fetch_forecast(district, state)
+        if forecast:
+            await self.store(district, state, forecast)
+        return forecast
+
+    async def _refresh_in_background(self, district: str, state: str) -> None:
+        key = forecast_key(district, state)
+        try:
+            if await self.client.set(f"{key}:refresh", 1, nx=True, ex=60):
+                await self.refresh(district, state)
+        except Exception as e:
+            print(f"Error refreshing weather for {district}, {state}: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    async def get(self, district: str, state: str) -> Optional[Dict[str, Any]]:
+        key = forecast_key(district, state)
+        try:
+            raw = await self.client.get(key)
+        except Exception as e:
+            print(f"Weather cache error: {e}")
+            raw = None
+
+        if raw is None:
+            return await self.refresh(district, state)
+
+        entry = json.loads(raw)
+        if time.time() - entry["fetched_at"] > self.fresh_ttl and key not in self._refreshing:
+            self._refreshing.add(key)
+            task = asyncio.create_task(self._refresh_in_background(district, state))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return entry["forecast"]
+
+forecast_cache = ForecastCache()